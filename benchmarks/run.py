@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""Benchmark wtftz's parse and convert paths, and check for regressions.
+
+Every function is timed against every class of input in `CORPUS`, and the
+ops/sec, p50 and p99 latencies are compared with a stored baseline:
+
+    $ python benchmarks/run.py
+    $ python benchmarks/run.py --margin 0.5 --only iso
+    $ python benchmarks/run.py --update
+
+Baselines are only comparable on the machine that made them, so run with
+`--update` on a quiet machine before relying on the comparison.
+"""
+import argparse
+from datetime import datetime
+from datetime import timedelta
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from wtftz.converter import convert  # noqa: E402
+from wtftz.converter import convert_free  # noqa: E402
+from wtftz.converter import parse_timestamp  # noqa: E402
+from wtftz.parser import free_text  # noqa: E402
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "baseline.json")
+SAMPLES = 200
+
+timer = getattr(time, "perf_counter", time.time)
+
+
+def _corpus(seed=1355164289, size=SAMPLES):
+    """Build a reproducible corpus of timestamps, by class of input."""
+    rand = random.Random(seed)
+    start = datetime(2012, 1, 1)
+    stamps = [start + timedelta(seconds=rand.randint(0, 365 * 86400),
+                                microseconds=rand.randint(0, 999999))
+              for _ in range(size)]
+    epoch = datetime(1970, 1, 1)
+    seconds = [(ts - epoch).total_seconds() for ts in stamps]
+    return {
+        "epoch_int": [str(int(s)) for s in seconds],
+        "epoch_float": ["{s:.6f}".format(s=s) for s in seconds],
+        "iso": [ts.isoformat() for ts in stamps],
+        "iso_offset": [ts.isoformat() + rand.choice(
+            ["Z", "-05:00", "+05:30", "-08:00"]) for ts in stamps],
+        "ctime_zone": [ts.strftime("%a %b %d %H:%M:%S ") +
+                       rand.choice(["EST", "PST", "UTC", "CST"]) +
+                       ts.strftime(" %Y") for ts in stamps],
+        "slashed": [ts.strftime("%Y/%m/%d %H:%M:%S") for ts in stamps],
+        "dateutil": [ts.strftime("%d %B %Y %I:%M%p") for ts in stamps],
+        "garbage": ["".join(rand.choice("abcxyz:-/ 0123") for _ in range(12))
+                    for _ in stamps],
+    }
+
+
+CORPUS = _corpus()
+
+FUNCTIONS = {
+    "convert": lambda ts: convert(ts, "pst"),
+    "convert_free": lambda ts: convert_free(ts + " to pst"),
+    "parse_timestamp": parse_timestamp,
+    "free_text": lambda ts: free_text(ts + " from utc to pst"),
+}
+
+
+def measure(function, inputs, rounds=5):
+    """Time `function` over `inputs`.
+
+    Returns a dict of ops_per_sec, and the p50 and p99 latency in
+    microseconds.
+    """
+    # Warm up any caches, so we measure the steady state.
+    for value in inputs:
+        _call(function, value)
+    latencies = []
+    for _ in range(rounds):
+        for value in inputs:
+            start = timer()
+            _call(function, value)
+            latencies.append(timer() - start)
+    latencies.sort()
+    return {
+        "ops_per_sec": round(len(latencies) / sum(latencies), 1),
+        "p50_us": round(_percentile(latencies, 0.50) * 1e6, 2),
+        "p99_us": round(_percentile(latencies, 0.99) * 1e6, 2),
+    }
+
+
+def _call(function, value):
+    try:
+        function(value)
+    except ValueError:
+        # Garbage is expected to fail, but how fast it fails matters too.
+        pass
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def run(only=None):
+    """Run every benchmark whose name contains `only`."""
+    results = {}
+    for function_name in sorted(FUNCTIONS):
+        for input_class in sorted(CORPUS):
+            name = "{function}/{input}".format(
+                function=function_name, input=input_class)
+            if only and only not in name:
+                continue
+            results[name] = measure(
+                FUNCTIONS[function_name], CORPUS[input_class])
+    return results
+
+
+def compare(results, baseline, margin):
+    """Find results slower than the baseline by more than `margin`.
+
+    Returns a list of (name, result, baseline_result) regressions.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        expected = baseline.get(name)
+        if expected and result["ops_per_sec"] < \
+                expected["ops_per_sec"] * (1 - margin):
+            regressions.append((name, result, expected))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--baseline', default=BASELINE,
+        help="The baseline JSON file.")
+    parser.add_argument('--margin', type=float, default=0.25,
+        help="How much slower than the baseline is a regression, as a "
+             "fraction. Defaults to 0.25.")
+    parser.add_argument('--only',
+        help="Only run benchmarks whose name contains this.")
+    parser.add_argument('--update', action="store_true",
+        help="Write the results as the new baseline.")
+    args = parser.parse_args(argv)
+
+    results = run(args.only)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print("{name:32} {ops:>12} {p50:>10} {p99:>10} {change:>8}".format(
+        name="benchmark", ops="ops/sec", p50="p50 us", p99="p99 us",
+        change="change"))
+    for name, result in sorted(results.items()):
+        change = ""
+        if name in baseline:
+            change = "{c:+.0%}".format(c=result["ops_per_sec"] /
+                                       baseline[name]["ops_per_sec"] - 1)
+        print("{name:32} {ops:>12,.0f} {p50:>10.2f} {p99:>10.2f} "
+              "{change:>8}".format(name=name, ops=result["ops_per_sec"],
+                                   p50=result["p50_us"],
+                                   p99=result["p99_us"], change=change))
+
+    if args.update:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        return 0
+
+    regressions = compare(results, baseline, args.margin)
+    for name, result, expected in regressions:
+        print("REGRESSION {name}: {ops:,.0f} ops/sec, baseline "
+              "{expected:,.0f}".format(name=name, ops=result["ops_per_sec"],
+                                       expected=expected["ops_per_sec"]))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -64,4 +64,7 @@ setup(
         'python-dateutil>=1.5',
         'pytz',
     ],
+    extras_require={
+        'numpy': ['numpy'],
+    },
 )
@@ -1,11 +1,71 @@
+from array import array
 from datetime import datetime
+from datetime import timedelta
+import csv
+import io
+import json
+import os
+import pickle
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
 import time
+from unittest import skipIf
 from unittest import TestCase
 
+from dateutil import parser as date_parser
+from dateutil import tz as date_tz
 import pytz
+try:
+    import zoneinfo
+except ImportError:
+    zoneinfo = None
 
 import wtftz
+from wtftz import stats
+from wtftz import abbreviations
+from wtftz import inplace
+from wtftz.cache import ConversionMemo
+from wtftz.cache import LRUCache
+from wtftz.csvconvert import convert_csv
+from wtftz.csvconvert import parse_columns
+from wtftz.converter import common_tz_name_to_real_tz
+from wtftz.converter import parse_timestamp
+from wtftz.converter import tz_cache
+from wtftz.formats import fast_parse
+from wtftz.formatting import Renderer
+from wtftz.learner import FormatLearner
+from wtftz import parallel
+from wtftz.parallel import chunk_ranges
+from wtftz.parallel import convert_file
 from wtftz.parser import free_text
+from wtftz import server
+from wtftz.stream import convert_lines
+from wtftz.timezones import LazyTimezones
+from wtftz.transitions import OffsetCache
+from wtftz.transitions import index_for
+from wtftz import vectorized
+
+
+def setUpModule():
+    # Keep the abbreviations index out of the real cache
+    global _cache_dir, _old_cache_dir
+    _cache_dir = tempfile.mkdtemp()
+    _old_cache_dir = os.environ.get("WTFTZ_CACHE_DIR")
+    os.environ["WTFTZ_CACHE_DIR"] = _cache_dir
+    abbreviations.configure()
+
+
+def tearDownModule():
+    if _old_cache_dir is None:
+        del os.environ["WTFTZ_CACHE_DIR"]
+    else:
+        os.environ["WTFTZ_CACHE_DIR"] = _old_cache_dir
+    abbreviations.configure()
+    shutil.rmtree(_cache_dir)
 
 
 def _epoch(ts):
@@ -282,6 +342,25 @@ class TestFromTo(TestCase):
         self._test_extraction(
             query, self.est_ts_str, None, "US/Pacific")
 
+    def test_extraction_no_to(self):
+        self._test_extraction(self.utc_ts_str, self.utc_ts_str, None, None)
+        self._test_extraction(
+            "{ts} from est".format(ts=self.est_ts_str),
+            self.est_ts_str, "est", None)
+        self.assertEqual(wtftz.convert_free(self.utc_ts_str), self.utc_ts)
+
+    def test_extraction_to_inside_word(self):
+        self._test_extraction(
+            "7 October 2012 12:25:46 to America/Toronto",
+            "7 October 2012 12:25:46", None, "America/Toronto")
+
+    def test_extraction_implicit_from(self):
+        self._test_extraction(
+            "Mon Dec 10 23:31:50 EST 2012 to UTC",
+            "Mon Dec 10 23:31:50 2012", "EST", "UTC")
+        self._test_extraction(
+            "Dec 10 2012 10am to UTC", "Dec 10 2012 10am", None, "UTC")
+
     def test_extraction_no_from_keyword(self):
         query_template = "{ts} {fromz} to {toz}"
         query = query_template.format(ts=self.est_ts_str,
@@ -317,3 +396,1261 @@ class TestTimesWithoutDates(TestCase):
         self.assertEqual(
             wtftz.convert(_epoch(ts), from_tz="pst", to_tz="utc"),
             wtftz.convert(ts, from_tz="pdt", to_tz="utc"))
+
+
+class TestConvertMany(TestCase):
+    def setUp(self):
+        self.utc_ts = datetime.utcnow()
+        self.est_ts = _convert(self.utc_ts, to_tz=pytz.timezone("US/Eastern"))
+
+    def test_convert_many(self):
+        stamps = [self.utc_ts.isoformat(), self.utc_ts]
+        self.assertEqual(list(wtftz.convert_many(stamps, 'est')),
+                         [self.est_ts, self.est_ts])
+
+    def test_lazy(self):
+        def stamps():
+            yield self.utc_ts.isoformat()
+            raise AssertionError("Consumed too much")
+        converted = wtftz.convert_many(stamps(), 'est')
+        self.assertEqual(next(converted), self.est_ts)
+
+    def test_errors(self):
+        stamps = [self.utc_ts.isoformat(), "garbage"]
+        self.assertRaises(
+            ValueError, list, wtftz.convert_many(stamps, 'est'))
+        self.assertEqual(
+            list(wtftz.convert_many(stamps, 'est', errors='skip')),
+            [self.est_ts])
+        self.assertEqual(
+            list(wtftz.convert_many(stamps, 'est', errors='pass')),
+            [self.est_ts, "garbage"])
+        self.assertRaises(
+            ValueError, wtftz.convert_many, stamps, 'est', errors='ignore')
+
+
+class TestFastParse(TestCase):
+    def _test_matches_dateutil(self, timestamp):
+        parsed, zone = fast_parse(timestamp)
+        self.assertEqual(zone, None)
+        self.assertEqual(parsed, date_parser.parse(timestamp))
+        self.assertEqual(parsed.utcoffset(),
+                         date_parser.parse(timestamp).utcoffset())
+
+    def test_iso8601(self):
+        self._test_matches_dateutil("2012-12-23T14:23:03.826437-05:00")
+        self._test_matches_dateutil("2012-12-23T14:23:03.826437")
+        self._test_matches_dateutil("2012-12-23T14:23:03Z")
+        self._test_matches_dateutil("2012-12-23T14:23:03+0530")
+        self._test_matches_dateutil("2012-12-23 14:23")
+        self._test_matches_dateutil("2012-12-23")
+
+    def test_rfc2822(self):
+        self._test_matches_dateutil("Mon, 10 Dec 2012 23:31:50 -0500")
+        self._test_matches_dateutil("10 Dec 2012 23:31:50 GMT")
+
+    def test_ctime(self):
+        self._test_matches_dateutil("Sat Dec  1 23:31:50 2012")
+        self.assertEqual(fast_parse("Mon Dec 10 23:31:50 EST 2012"),
+                         (datetime(2012, 12, 10, 23, 31, 50), "EST"))
+
+    def test_slashed(self):
+        self._test_matches_dateutil("2012/10/7 12:25:46")
+        self._test_matches_dateutil("2012/10/07")
+
+    def test_fallback(self):
+        self.assertEqual(fast_parse("7 October 2012 12:25:46"), None)
+        self.assertEqual(fast_parse("2012-13-01"), None)
+        self.assertEqual(fast_parse("10am"), None)
+        self.assertEqual(parse_timestamp("7 October 2012 12:25:46"),
+                         datetime(2012, 10, 7, 12, 25, 46))
+
+
+class TestFormatLearner(TestCase):
+    def test_learns_template(self):
+        learner = FormatLearner(samples=3)
+        stamps = ["12/10/2012 11:31:%02d PM" % second
+                  for second in range(10)]
+        parsed = [learner.parse(ts) for ts in stamps]
+        self.assertEqual(parsed, [parse_timestamp(ts) for ts in stamps])
+        self.assertEqual(learner.template.template, "%m/%d/%Y %I:%M:%S %p")
+        self.assertEqual(learner.hits, 7)
+        self.assertEqual(learner.fallbacks, 0)
+
+    def test_fallback(self):
+        learner = FormatLearner(samples=1)
+        learner.parse("2012-12-10 23:31:50")
+        self.assertEqual(learner.parse("Mon Dec 10 23:31:50 EST 2012"),
+                         parse_timestamp("Mon Dec 10 23:31:50 EST 2012"))
+        self.assertEqual(learner.fallbacks, 1)
+        self.assertEqual(learner.fallback_rate, 1.0)
+        self.assertRaises(ValueError, learner.parse, "garbage")
+
+    def test_zone_template(self):
+        learner = FormatLearner(samples=1)
+        learner.parse("Mon Dec 10 23:31:50 EST 2012")
+        self.assertEqual(
+            learner.parse("Mon Dec 10 23:31:50 PST 2012"),
+            pytz.timezone("US/Pacific").localize(
+                datetime(2012, 12, 10, 23, 31, 50)))
+        self.assertEqual(learner.hits, 1)
+
+    def test_no_template(self):
+        learner = FormatLearner(samples=1)
+        learner.parse("7 October 2012 12:25:46")
+        self.assertEqual(learner.template, None)
+        self.assertEqual(learner.parse("8 October 2012 12:25:46"),
+                         datetime(2012, 10, 8, 12, 25, 46))
+
+    def test_convert_many(self):
+        learner = FormatLearner(samples=1)
+        stamps = ["2012/12/10 18:31:29", "2012/12/10 18:31:30"]
+        self.assertEqual(
+            list(wtftz.convert_many(stamps, 'est', learner=learner)),
+            [datetime(2012, 12, 10, 13, 31, 29),
+             datetime(2012, 12, 10, 13, 31, 30)])
+        self.assertEqual(learner.hits, 1)
+
+
+class TestTzCache(TestCase):
+    def setUp(self):
+        tz_cache.clear()
+
+    def test_caches_hits_and_misses(self):
+        self.assertEqual(common_tz_name_to_real_tz("PST"),
+                         pytz.timezone("US/Pacific"))
+        self.assertEqual(common_tz_name_to_real_tz("PST"),
+                         pytz.timezone("US/Pacific"))
+        self.assertEqual(common_tz_name_to_real_tz("junk"), None)
+        self.assertEqual(common_tz_name_to_real_tz("junk"), None)
+        stats = tz_cache.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['size'], 2)
+
+    def test_clear(self):
+        common_tz_name_to_real_tz("PST")
+        tz_cache.clear()
+        self.assertEqual(tz_cache.stats()['size'], 0)
+        self.assertEqual(tz_cache.stats()['hits'], 0)
+
+    def test_bounded(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("b"), LRUCache.missing)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+
+class TestStream(TestCase):
+    def test_whole_line(self):
+        lines = [b"2012-12-10T18:31:29\n", b"garbage\r\n",
+                 b"2012-12-10T18:31:30"]
+        self.assertEqual(
+            list(convert_lines(lines, "est")),
+            [b"2012-12-10 13:31:29\n", b"garbage\r\n",
+             b"2012-12-10 13:31:30"])
+
+    def test_field(self):
+        lines = [b"a  2012-12-10T18:31:29\tb\n", b"a\n"]
+        self.assertEqual(
+            list(convert_lines(lines, "est", field=1)),
+            [b"a  2012-12-10 13:31:29\tb\n", b"a\n"])
+        lines = [b"a|b|2012-12-10T18:31:29\n", b"a|2012-12-10T18:31:29|b\n"]
+        self.assertEqual(
+            list(convert_lines(lines, "est", delimiter=b"|", field=2)),
+            [b"a|b|2012-12-10 13:31:29\n", b"a|2012-12-10T18:31:29|b\n"])
+
+    def test_pattern(self):
+        lines = [b"[Mon Dec 10 23:31:50 EST 2012] GET /\n"]
+        self.assertEqual(
+            list(convert_lines(lines, "utc", pattern=br"\[([^]]+)\]")),
+            [b"[2012-12-11 04:31:50] GET /\n"])
+
+
+class TestParallel(TestCase):
+    def test_chunk_ranges(self):
+        data = b"a\nbb\n\nccc\nd"
+        for size in range(1, len(data) + 2):
+            ranges = list(chunk_ranges(data, size))
+            self.assertEqual(b"".join(data[s:e] for s, e in ranges), data)
+            for start, end in ranges[:-1]:
+                self.assertEqual(data[end - 1:end], b"\n")
+
+    def test_convert_file(self):
+        lines = [b"%d 2012-12-10T18:31:%02d\n" % (i, i) for i in range(60)]
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "wb") as f:
+            f.writelines(lines)
+        converted = b"".join(
+            convert_file(path, jobs=2, chunk_size=100, to_tz="est", field=1))
+        self.assertEqual(converted, b"".join(convert_lines(
+            lines, "est", field=1)))
+
+    def test_bounded(self):
+        # A slow reader holds up converting, rather than the converted chunks
+        # piling up
+        lines = [b"2012-12-10T18:31:%02d\n" % (i % 60) for i in range(200)]
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "wb") as f:
+            f.writelines(lines)
+        spans = []
+        chunk_ranges = parallel.chunk_ranges
+
+        def counted(view, chunk_size):
+            for span in chunk_ranges(view, chunk_size):
+                spans.append(span)
+                yield span
+        parallel.chunk_ranges = counted
+        self.addCleanup(setattr, parallel, "chunk_ranges", chunk_ranges)
+        chunks = convert_file(path, jobs=2, chunk_size=100, max_pending=3,
+                              to_tz="est")
+        first = next(chunks)
+        self.assertEqual(len(spans), 4)
+        converted = first + b"".join(chunks)
+        self.assertEqual(converted, b"".join(convert_lines(lines, "est")))
+        self.assertEqual(len(spans), len(list(chunk_ranges(
+            b"".join(lines), 100))))
+
+
+@skipIf(vectorized.numpy is None, "NumPy is not installed")
+class TestVectorized(TestCase):
+    def _test_matches_convert(self, epochs, to_tz, from_tz):
+        converted = vectorized.convert_epochs(epochs, to_tz, from_tz)
+        for value, result in zip(epochs, converted.tolist()):
+            # Epochs are wall clock times in from_tz, whatever the machine's
+            # timezone is, so compare with the same wall clock as a naive
+            # datetime rather than with convert(epoch).
+            ts = datetime(1970, 1, 1) + timedelta(seconds=value)
+            self.assertEqual(result, wtftz.convert(ts, to_tz, from_tz))
+
+    def test_dst_transitions(self):
+        # Every 15 minutes around the 2012 US and EU DST transitions
+        for start in (1331424000, 1332633600, 1351382400, 1351987200):
+            epochs = list(range(start - 86400, start + 86400, 900))
+            self._test_matches_convert(epochs, "US/Pacific", "utc")
+            self._test_matches_convert(epochs, "utc", "US/Pacific")
+            self._test_matches_convert(epochs, "Europe/London", "est")
+
+    def test_units(self):
+        seconds = vectorized.convert_epochs([1355164289], "est")
+        self.assertEqual(seconds[0].item(), datetime(2012, 12, 10, 13, 31, 29))
+        millis = vectorized.convert_epochs([1355164289000], "est", unit="ms")
+        floats = vectorized.convert_epochs([1355164289.5], "est")
+        self.assertEqual(seconds[0], millis[0])
+        self.assertEqual(str(floats[0]), "2012-12-10T13:31:29.500000")
+        self.assertEqual(
+            vectorized.convert_epochs([1355164289], "est", output="epoch")[0],
+            1355164289 - 5 * 3600)
+        self.assertRaises(
+            ValueError, vectorized.convert_epochs, [1], "est", unit="m")
+
+
+class TestTransitionIndex(TestCase):
+    def _test_matches_pytz(self, timestamps, timezone):
+        for ts in timestamps:
+            localized = timezone.localize(ts)
+            self.assertEqual(wtftz.convert(ts, 'utc', timezone),
+                             pytz.utc.normalize(localized).replace(
+                                 tzinfo=None))
+            converted = wtftz.convert(ts, timezone, 'utc', naive=False)
+            expected = pytz.utc.localize(ts).astimezone(timezone)
+            self.assertEqual(converted, expected)
+            self.assertEqual(converted.tzname(), expected.tzname())
+
+    def test_ambiguous(self):
+        self._test_matches_pytz(
+            [datetime(2012, 11, 4, 1, 30), datetime(2012, 11, 4, 1, 0),
+             datetime(2012, 11, 4, 2, 0)],
+            pytz.timezone("US/Pacific"))
+        self._test_matches_pytz(
+            [datetime(2012, 10, 28, 1, 30), datetime(2012, 10, 28, 2, 30)],
+            pytz.timezone("Europe/London"))
+
+    def test_non_existent(self):
+        self._test_matches_pytz(
+            [datetime(2012, 3, 11, 2, 30), datetime(2012, 3, 11, 3, 0)],
+            pytz.timezone("US/Pacific"))
+        self._test_matches_pytz(
+            [datetime(2012, 3, 25, 1, 30)], pytz.timezone("Europe/London"))
+
+    def test_unsupported_tzinfo(self):
+        eastern = date_parser.parse("2012-12-10T13:31:29-05:00").tzinfo
+        self.assertEqual(index_for(eastern), None)
+        self.assertEqual(
+            wtftz.convert(datetime(2012, 12, 10, 13, 31, 29), 'utc',
+                          eastern),
+            datetime(2012, 12, 10, 18, 31, 29))
+
+
+@skipIf(sys.version_info < (3, 7), "-X importtime needs Python 3.7")
+class TestImportTime(TestCase):
+    # The most `import wtftz` may take, in microseconds. It's about 35ms,
+    # with pytz, on a laptop.
+    IMPORT_BUDGET_US = 75000
+
+    def _import_times(self):
+        """Import wtftz in a fresh interpreter, return {module: cumulative}"""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output(
+            [sys.executable, "-X", "importtime", "-c", "import wtftz"],
+            stderr=subprocess.STDOUT, cwd=root).decode("utf-8")
+        times = {}
+        for line in output.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            self_us, cumulative, module = line[len("import time:"):].split(
+                "|")
+            times[module.strip()] = int(cumulative)
+        return times
+
+    def test_lazy_imports(self):
+        times = self._import_times()
+        self.assertTrue("wtftz" in times)
+        self.assertFalse([module for module in times
+                          if module.startswith("dateutil")])
+        self.assertFalse("wtftz.abbreviations" in times)
+
+    def test_import_budget(self):
+        # Take the best of a few, so a busy machine doesn't fail the test.
+        best = min(self._import_times()["wtftz"] for _ in range(3))
+        self.assertTrue(best < self.IMPORT_BUDGET_US,
+                        "import wtftz took {us}us".format(us=best))
+
+    def test_common_timezones_are_lazy(self):
+        timezones = LazyTimezones({"home": "US/Pacific"})
+        self.assertEqual(timezones._zones, {})
+        self.assertTrue("home" in timezones)
+        self.assertEqual(timezones["home"], pytz.timezone("US/Pacific"))
+        self.assertEqual(list(timezones._zones), ["home"])
+        self.assertRaises(KeyError, lambda: timezones["away"])
+
+
+class TestStats(TestCase):
+    def setUp(self):
+        stats.reset()
+        tz_cache.clear()
+        self.addCleanup(stats.disable)
+        self.addCleanup(stats.reset)
+
+    def test_disabled(self):
+        wtftz.convert("2012-12-10T18:31:29", "pst")
+        snapshot = stats.snapshot()
+        self.assertFalse(snapshot['enabled'])
+        self.assertEqual(snapshot['counters'], {})
+        self.assertEqual(snapshot['timings'], {})
+
+    def test_counts_strategies(self):
+        stats.enable()
+        wtftz.convert("1355164289", "pst")
+        wtftz.convert("2012-12-10T18:31:29", "pst")
+        wtftz.convert("7 October 2012 12:25:46", "pst")
+        self.assertRaises(ValueError, wtftz.convert, "garbage", "pst")
+        snapshot = stats.snapshot()
+        counters = snapshot['counters']
+        self.assertEqual(counters['parse.epoch'], 1)
+        self.assertEqual(counters['parse.fast'], 1)
+        self.assertEqual(counters['parse.dateutil'], 1)
+        self.assertEqual(counters['parse.failed'], 1)
+        # Three failed float()s, and dateutil failing on the garbage
+        self.assertEqual(counters['exceptions'], 4)
+        self.assertEqual(sorted(snapshot['timings']),
+                         ['dateutil', 'epoch', 'fast'])
+        # "pst", "utc" and the "garbage" implicit zone are each looked up
+        # once, then "pst" and "utc" come from the cache.
+        self.assertEqual(snapshot['tz_cache']['misses'], 3)
+        self.assertEqual(snapshot['tz_cache']['hits'], 6)
+
+
+@skipIf(not hasattr(server.socket, "AF_UNIX"), "No Unix sockets")
+class TestServer(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, "wtftz.sock")
+        self.server = server.ConversionServer(
+            self.path, server.ConversionHandler)
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  args=(0.01,))
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(os.rmdir, directory)
+        self.addCleanup(os.remove, self.path)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_pipelined(self):
+        responses = server.request(
+            ["2012-12-10T18:31:29\tpst"] * 100 +
+            ["garbage\tpst", "2012-12-10T13:31:29\tutc\test", "nonsense"],
+            self.path)
+        self.assertEqual(responses[:100], ["ok\t2012-12-10 10:31:29"] * 100)
+        self.assertEqual(responses[100],
+                         "error\tCannot parse timestamp garbage")
+        self.assertEqual(responses[101], "ok\t2012-12-10 18:31:29")
+        self.assertTrue(responses[102].startswith("error\t"))
+
+    def test_concurrent_clients(self):
+        results = []
+
+        def client():
+            results.extend(server.request(
+                ["2012-12-10T18:31:29\test"] * 10, self.path))
+        threads = [threading.Thread(target=client) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["ok\t2012-12-10 13:31:29"] * 80)
+
+    def test_no_server(self):
+        self.assertRaises(server.socket.error, server.request,
+                          ["2012-12-10T18:31:29\tpst"], self.path + ".nope")
+
+    def test_untrusted(self):
+        # Anything that isn't our own socket, in a directory only we can
+        # write to, might be someone else's
+        path = self.path + ".file"
+        open(path, "w").close()
+        self.addCleanup(os.remove, path)
+        self.assertFalse(server.is_trusted(path))
+        self.assertRaises(server.socket.error, server.request,
+                          ["2012-12-10T18:31:29\tpst"], path)
+        directory = os.path.dirname(self.path)
+        self.assertTrue(server.is_trusted(self.path))
+        os.chmod(directory, 0o777)
+        self.addCleanup(os.chmod, directory, 0o700)
+        self.assertFalse(server.is_trusted(self.path))
+        self.assertRaises(RuntimeError, server.serve,
+                          os.path.join(directory, "other.sock"))
+
+    def _environ(self, **values):
+        """Set environment variables, or unset them for None, until the
+        end of the test."""
+        for name, value in values.items():
+            self.addCleanup(_restore_environ, name, os.environ.get(name))
+            _restore_environ(name, value)
+
+    def test_command(self):
+        command = runpy.run_path(os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            "bin", "wtftz"))["convert_with_server"]
+        self._environ(WTFTZ_SOCKET=self.path)
+        self.assertEqual(command(["2012-12-10T18:31:29", "pst"]),
+                         "2012-12-10 10:31:29")
+        # Epochs are in the local timezone, which the server may not share
+        self.assertIsNone(command(["1355164289", "pst"]))
+        self.assertIsNone(command(["1355164289.5", "pst"]))
+        os.chmod(os.path.dirname(self.path), 0o777)
+        self.addCleanup(os.chmod, os.path.dirname(self.path), 0o700)
+        self.assertIsNone(command(["2012-12-10T18:31:29", "pst"]))
+
+    def test_default_socket_path(self):
+        self._environ(WTFTZ_SOCKET=None, XDG_RUNTIME_DIR="/run/user/7",
+                      TMPDIR="/tmp")
+        self.assertEqual(server.default_socket_path(),
+                         "/run/user/7/wtftz.sock")
+        self._environ(XDG_RUNTIME_DIR=None)
+        self.assertEqual(
+            server.default_socket_path(),
+            "/tmp/wtftz-{uid}/wtftz.sock".format(uid=os.getuid()))
+
+
+def _restore_environ(name, value):
+    if value is None:
+        os.environ.pop(name, None)
+    else:
+        os.environ[name] = value
+
+
+@skipIf(sys.version_info < (3, 6), "async generators need Python 3.6")
+class TestAio(TestCase):
+    def _collect(self, stamps, **kwargs):
+        import asyncio
+        from wtftz.aio import aconvert_stream
+
+        async def source():
+            for ts in stamps:
+                await asyncio.sleep(0)
+                yield ts
+
+        async def collect():
+            return [ts async for ts in aconvert_stream(source(), **kwargs)]
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        return loop.run_until_complete(collect())
+
+    def test_in_order(self):
+        stamps = ["2012-12-10T18:31:%02d" % second for second in range(60)]
+        converted = self._collect(stamps, to_tz="est", chunk_size=7,
+                                  max_pending=3)
+        self.assertEqual(converted, [datetime(2012, 12, 10, 13, 31, second)
+                                     for second in range(60)])
+
+    def test_errors(self):
+        stamps = ["2012-12-10T18:31:29", "garbage"]
+        self.assertEqual(
+            self._collect(stamps, to_tz="est", errors="pass"),
+            [datetime(2012, 12, 10, 13, 31, 29), "garbage"])
+        self.assertRaises(ValueError, self._collect, stamps, to_tz="est")
+
+    def test_learner(self):
+        learner = FormatLearner(samples=2)
+        stamps = ["2012/12/10 18:31:%02d" % second for second in range(10)]
+        converted = self._collect(stamps, to_tz="est", chunk_size=3,
+                                  learner=learner)
+        self.assertEqual(len(converted), 10)
+        self.assertEqual(learner.hits, 8)
+
+    def test_raw(self):
+        self.assertEqual(
+            self._collect(["2012-12-10T18:31:29"], to_tz="est", fmt="raw"),
+            [(1355164289000000, -18000)])
+
+    def test_idle_source(self):
+        # A source that sends a few timestamps and then goes quiet, like a
+        # socket, still gets them back without waiting for a full chunk.
+        import asyncio
+        from wtftz.aio import aconvert_stream
+        finished = []
+
+        async def source():
+            for second in range(3):
+                yield "2012-12-10T18:31:%02d" % second
+            await asyncio.sleep(60)
+            finished.append(True)
+
+        async def first(count):
+            stream = aconvert_stream(source(), "est")
+            try:
+                return [await asyncio.wait_for(stream.__anext__(), 1)
+                        for _ in range(count)]
+            finally:
+                await stream.aclose()
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        self.assertEqual(loop.run_until_complete(first(3)),
+                         [datetime(2012, 12, 10, 13, 31, second)
+                          for second in range(3)])
+        self.assertEqual(finished, [])
+
+    def test_source_errors(self):
+        async def source():
+            yield "2012-12-10T18:31:29"
+            yield "2012-12-10T18:31:30"
+            raise IOError("Connection reset")
+
+        import asyncio
+        from wtftz.aio import aconvert_stream
+        converted = []
+
+        async def collect():
+            async for ts in aconvert_stream(source(), "est"):
+                converted.append(ts)
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        self.assertRaises(IOError, loop.run_until_complete, collect())
+        # Everything read before the error is still converted
+        self.assertEqual(converted, [
+            datetime(2012, 12, 10, 13, 31, 29),
+            datetime(2012, 12, 10, 13, 31, 30)])
+
+
+class TestRewrite(TestCase):
+    def test_rewrite(self):
+        text = ("deploy 2012-12-10T18:31:29Z ok\n"
+                "rollback Mon Dec 10 13:45:00 EST 2012, "
+                "Mon, 10 Dec 2012 13:50:00 -0500 done")
+        self.assertEqual(
+            wtftz.rewrite(text, "pst"),
+            "deploy 2012-12-10 10:31:29 ok\n"
+            "rollback 2012-12-10 10:45:00, 2012-12-10 10:50:00 done")
+
+    def test_from_tz(self):
+        self.assertEqual(
+            wtftz.rewrite("at 2012-12-10 13:31:29 or so", "utc", "est"),
+            "at 2012-12-10 18:31:29 or so")
+
+    def test_epochs(self):
+        epoch = _epoch(datetime(2012, 12, 10, 18, 31, 29))
+        self.assertEqual(
+            wtftz.rewrite("took {e} ms, id 123456789012, port 8080".format(
+                e=epoch), "utc"),
+            "took {ts} ms, id 123456789012, port 8080".format(
+                ts=wtftz.convert(epoch, "utc")))
+        self.assertEqual(wtftz.rewrite("pid 999999999", "utc"),
+                         "pid 999999999")
+
+    def test_leaves_garbage(self):
+        text = "version 2012-99-99T99:99:99 and 10.1355164289.3"
+        self.assertEqual(wtftz.rewrite(text, "pst"), text)
+
+    def test_punctuation(self):
+        self.assertEqual(
+            wtftz.rewrite("Deployed at 2012-12-10T18:31:29Z.", "pst"),
+            "Deployed at 2012-12-10 10:31:29.")
+        self.assertEqual(
+            wtftz.rewrite("ts=1355164289. At 2012-12-10 18:31.", "pst"),
+            "ts=2012-12-10 10:31:29. At 2012-12-10 10:31:00.")
+        text = "2012-12-10T18:31:29.1234567890 1355164289.1234567"
+        self.assertEqual(wtftz.rewrite(text, "pst"), text)
+
+    def test_iso_zone(self):
+        self.assertEqual(
+            wtftz.rewrite("at 2012-12-10 18:31:29 UTC ok", "pst"),
+            "at 2012-12-10 10:31:29 ok")
+        self.assertEqual(
+            wtftz.rewrite("at 2012-12-10T13:31:29 EST, ok", "pst"),
+            "at 2012-12-10 10:31:29, ok")
+        # Not a timezone, so it's left alone
+        self.assertEqual(
+            wtftz.rewrite("2012-12-10 18:31:29 ERROR disk full", "pst"),
+            "2012-12-10 10:31:29 ERROR disk full")
+
+
+class TestInPlace(TestCase):
+    def _write(self, data):
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return path
+
+    def _read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_rewrite_file(self):
+        path = self._write(
+            b"a 2012-12-10T18:31:29.000001 start\n"
+            b"short\n"
+            b"b 2012-07-10T18:31:29.000002 end")
+        self.assertEqual(inplace.rewrite_file(path, 2, to_tz="US/Eastern"),
+                         (2, 1))
+        self.assertEqual(self._read(path),
+                         b"a 2012-12-10T13:31:29.000001 start\n"
+                         b"short\n"
+                         b"b 2012-07-10T14:31:29.000002 end")
+
+    def test_template(self):
+        path = self._write(b"2012/12/10 18:31:29|x\n2012/99/99 99:99:99|y\n")
+        self.assertEqual(inplace.rewrite_file(
+            path, template="%Y/%m/%d %H:%M:%S", to_tz="pst"), (1, 1))
+        self.assertEqual(self._read(path),
+                         b"2012/12/10 10:31:29|x\n2012/99/99 99:99:99|y\n")
+
+    def test_dry_run(self):
+        data = b"2012-12-10T18:31:29.000000\n"
+        path = self._write(data)
+        self.assertEqual(inplace.rewrite_file(path, to_tz="pst",
+                                              dry_run=True), (1, 0))
+        self.assertEqual(self._read(path), data)
+
+    def test_journal_undo(self):
+        data = b"".join(b"2012-12-10T18:31:%02d.000000\n" % second
+                        for second in range(10))
+        path = self._write(data)
+        journal = path + ".journal"
+        inplace.rewrite_file(path, to_tz="pst", journal=journal,
+                             batch_size=3)
+        self.assertFalse(os.path.exists(journal))
+        converted = self._read(path)
+        self.assertNotEqual(converted, data)
+
+        # Pretend we crashed after the first batch
+        with open(journal, "wb") as f:
+            f.write(b"".join(b"%d\t" % (27 * i) + data[27 * i:27 * i + 26] +
+                             b"\n" for i in range(3)))
+            f.write(b"81\t2012-12-10T1")
+        inplace.undo(path, journal)
+        self.assertEqual(self._read(path),
+                         data[:81] + converted[81:])
+        self.assertFalse(os.path.exists(journal))
+
+    def test_crash_then_rerun(self):
+        data = b"".join(b"2012-12-10T18:31:%02d.000000\n" % second
+                        for second in range(10))
+        path = self._write(data)
+        journal = path + ".journal"
+        self.addCleanup(lambda: os.path.exists(journal) and
+                        os.remove(journal))
+
+        # Crash after the first batch is journaled and written
+        write_batch = inplace._write_batch
+        calls = []
+
+        def crashing_write_batch(*args):
+            if calls:
+                raise KeyboardInterrupt
+            calls.append(args)
+            write_batch(*args)
+        inplace._write_batch = crashing_write_batch
+        try:
+            self.assertRaises(KeyboardInterrupt, inplace.rewrite_file, path,
+                              to_tz="pst", journal=journal, batch_size=3)
+        finally:
+            inplace._write_batch = write_batch
+        crashed = self._read(path)
+        self.assertNotEqual(crashed, data)
+
+        # Running it again would convert the first batch twice
+        self.assertRaises(RuntimeError, inplace.rewrite_file, path,
+                          to_tz="pst", journal=journal, batch_size=3)
+        self.assertEqual(self._read(path), crashed)
+        self.assertTrue(os.path.exists(journal))
+
+        inplace.undo(path, journal)
+        self.assertEqual(self._read(path), data)
+        self.assertEqual(inplace.rewrite_file(path, to_tz="pst",
+                                              journal=journal), (10, 0))
+        self.assertEqual(self._read(path), data.replace(b"T18", b"T10"))
+
+    def test_undo_duplicates(self):
+        # If a timestamp was journaled twice, the first, original, bytes are
+        # the ones to put back
+        path = self._write(b"2012-12-10T02:31:29.000000\n")
+        journal = path + ".journal"
+        with open(journal, "wb") as f:
+            f.write(b"0\t2012-12-10T18:31:29.000000\n"
+                    b"0\t2012-12-10T10:31:29.000000\n"
+                    b"0\t2012-12-10T1")
+        inplace.undo(path, journal)
+        self.assertFalse(os.path.exists(journal))
+        self.assertEqual(self._read(path), b"2012-12-10T18:31:29.000000\n")
+
+
+class TestCsvConvert(TestCase):
+    def _convert(self, text, columns, **kwargs):
+        outfile = io.StringIO()
+        rows = convert_csv(io.StringIO(text), outfile, columns, **kwargs)
+        return rows, outfile.getvalue()
+
+    def test_columns(self):
+        text = ("id,created_at,note,updated_at\n"
+                "1,2012-12-10T18:31:29,\"a, b\",2012-12-10 13:31:29\n"
+                "2,,x,junk\n")
+        self.assertEqual(
+            self._convert(text, [("created_at", "pst", None),
+                                 ("updated_at", None, "est")]),
+            (2, "id,created_at,note,updated_at\n"
+                "1,2012-12-10 10:31:29,\"a, b\",2012-12-10 18:31:29\n"
+                "2,,x,junk\n"))
+
+    def test_defaults_and_delimiter(self):
+        text = "ts\tn\n2012-12-10T18:31:29\t1\n2012-12-10T18:31:30\t2\n"
+        self.assertEqual(
+            self._convert(text, ["ts"], to_tz="est", delimiter="\t"),
+            (2, "ts\tn\n2012-12-10 13:31:29\t1\n2012-12-10 13:31:30\t2\n"))
+
+    def test_dialect(self):
+        text = "id,ts\r\n\"1\",2012-12-10T18:31:29\r\n"
+        self.assertEqual(
+            self._convert(text, ["ts"], to_tz="est"),
+            (1, "id,ts\r\n1,2012-12-10 13:31:29\r\n"))
+        self.assertEqual(
+            self._convert(text, ["ts"], to_tz="est", lineterminator="\n",
+                          quoting=csv.QUOTE_ALL),
+            (1, "\"id\",\"ts\"\n\"1\",\"2012-12-10 13:31:29\"\n"))
+
+    def test_unknown_column(self):
+        self.assertRaises(ValueError, self._convert, "a,b\n1,2\n", ["c"])
+        self.assertEqual(self._convert("", ["c"]), (0, ""))
+
+    def test_parse_columns(self):
+        self.assertEqual(parse_columns("a,b:pst,c::est,d:pst:est"),
+                         [("a", None, None), ("b", "pst", None),
+                          ("c", None, "est"), ("d", "pst", "est")])
+
+
+class TestConverter(TestCase):
+    def test_matches_convert(self):
+        stamps = ["2012-12-10T18:31:29", "2012-07-10T18:31:29-05:00",
+                  "Mon Dec 10 23:31:50 EST 2012", "1355164289",
+                  datetime(2012, 3, 11, 2, 30)]
+        for to_tz, from_tz, naive in [("pst", "utc", True),
+                                      ("utc", "US/Pacific", False),
+                                      ("Europe/London", "est", True)]:
+            convert = wtftz.Converter(to_tz, from_tz, naive)
+            for ts in stamps:
+                self.assertEqual(convert(ts),
+                                 wtftz.convert(ts, to_tz, from_tz, naive))
+
+    def test_unknown_timezone(self):
+        self.assertRaises(ValueError, wtftz.Converter, "nowhere")
+        self.assertRaises(ValueError, wtftz.Converter, "est", "nowhere")
+
+    def test_slots(self):
+        convert = wtftz.Converter("est")
+        self.assertRaises(AttributeError, setattr, convert, "other", 1)
+
+    def test_compile_free(self):
+        convert = wtftz.Converter.compile_free("{ts} from pst to est")
+        self.assertEqual(convert("2012-12-10T10:31:29"),
+                         wtftz.convert_free("2012-12-10T10:31:29 from pst "
+                                            "to est"))
+
+    def test_many(self):
+        convert = wtftz.Converter("est")
+        self.assertEqual(
+            list(convert.many(["2012-12-10T18:31:29", "garbage"], "skip")),
+            [datetime(2012, 12, 10, 13, 31, 29)])
+        self.assertRaises(ValueError, convert.many, [], "ignore")
+
+
+class TestConversionMemo(TestCase):
+    def test_last_value_and_lru(self):
+        memo = ConversionMemo(maxsize=2)
+        stamps = ["2012-12-10T18:31:29"] * 3 + ["2012-12-10T18:31:30",
+                                                 "2012-12-10T18:31:29"]
+        for ts in stamps:
+            self.assertEqual(wtftz.convert(ts, "pst", memo=memo),
+                             wtftz.convert(ts, "pst"))
+        stats = memo.stats()
+        self.assertEqual(
+            (stats["last_hits"], stats["hits"], stats["misses"]), (2, 1, 2))
+        self.assertEqual(stats["hit_rate"], 0.6)
+
+    def test_keyed_on_timezones(self):
+        memo = ConversionMemo()
+        ts = "2012-12-10T18:31:29"
+        self.assertEqual(wtftz.convert(ts, "pst", memo=memo),
+                         datetime(2012, 12, 10, 10, 31, 29))
+        self.assertEqual(wtftz.convert(ts, "est", memo=memo),
+                         datetime(2012, 12, 10, 13, 31, 29))
+        self.assertEqual(wtftz.convert(ts, "est", naive=False, memo=memo),
+                         wtftz.convert(ts, "est", naive=False))
+
+    def test_batch(self):
+        memo = ConversionMemo()
+        stamps = ["2012-12-10T18:31:29", "garbage"] * 3
+        self.assertEqual(
+            list(wtftz.convert_many(stamps, "est", errors="pass",
+                                    memo=memo)),
+            list(wtftz.convert_many(stamps, "est", errors="pass")))
+        self.assertEqual(len(memo), 1)
+        lines = [b"2012-12-10T18:31:29 a\n"] * 3
+        self.assertEqual(
+            list(convert_lines(lines, "est", field=0, memo=memo)),
+            [b"2012-12-10 13:31:29 a\n"] * 3)
+
+    def test_pickle(self):
+        memo = ConversionMemo(maxsize=10)
+        wtftz.convert("2012-12-10T18:31:29", memo=memo)
+        copy = pickle.loads(pickle.dumps(memo))
+        self.assertEqual((len(copy), copy.maxsize), (0, 10))
+
+
+class TestAbbreviations(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.cache_dir, "abbreviations.json")
+        self.old_cache_dir = os.environ["WTFTZ_CACHE_DIR"]
+        os.environ["WTFTZ_CACHE_DIR"] = self.cache_dir
+        abbreviations.configure()
+
+    def tearDown(self):
+        os.environ["WTFTZ_CACHE_DIR"] = self.old_cache_dir
+        abbreviations.configure()
+        for name in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, name))
+        os.rmdir(self.cache_dir)
+
+    def test_lookup(self):
+        for name, zone in [("CET", "CET"), ("jst", "Asia/Tokyo"),
+                           ("IST", "Asia/Kolkata"),
+                           ("AEST", "Australia/Sydney"),
+                           ("ChST", "Pacific/Guam"),
+                           ("EAT", "Africa/Nairobi")]:
+            self.assertEqual(common_tz_name_to_real_tz(name),
+                             pytz.timezone(zone))
+        self.assertEqual(abbreviations.lookup("lmt"), None)
+        self.assertEqual(abbreviations.lookup("nowhere"), None)
+
+    def test_convert(self):
+        self.assertEqual(wtftz.convert("2012-12-10 12:00:00", "utc", "jst"),
+                         datetime(2012, 12, 10, 3))
+        self.assertEqual(wtftz.convert("Mon Dec 10 12:00:00 CET 2012", "utc"),
+                         datetime(2012, 12, 10, 11))
+
+    def test_configure(self):
+        abbreviations.configure(preferred={"ist": "Europe/Dublin"})
+        self.assertEqual(common_tz_name_to_real_tz("ist"),
+                         pytz.timezone("Europe/Dublin"))
+        # Philippine Standard Time
+        abbreviations.configure(prefer_regions=["Asia/"])
+        self.assertEqual(abbreviations.lookup("pst"), "Asia/Manila")
+        abbreviations.configure()
+        self.assertEqual(abbreviations.lookup("pst"), "America/Los_Angeles")
+
+    def test_only_abbreviations(self):
+        # Names that can't be abbreviations don't need the index
+        self.assertEqual(common_tz_name_to_real_tz("2012-12-10"), None)
+        self.assertEqual(common_tz_name_to_real_tz("Nowhere/Else"), None)
+        self.assertEqual(abbreviations._index, None)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_unwritable_cache(self):
+        # A cache dir inside a file can never be made
+        os.environ["WTFTZ_CACHE_DIR"] = os.path.join(self.path, "cache")
+        with open(self.path, "w") as f:
+            f.write("not a directory")
+        self.assertEqual(abbreviations.lookup("cet"), "CET")
+        self.assertEqual(os.listdir(self.cache_dir), ["abbreviations.json"])
+
+    def test_cache_file(self):
+        abbreviations.lookup("cet")
+        with open(self.path) as f:
+            cached = json.load(f)
+        self.assertEqual(cached["header"]["format"],
+                         abbreviations.FORMAT_VERSION)
+        self.assertEqual(cached["header"]["pytz"], pytz.__version__)
+        self.assertEqual(cached["index"]["cet"], "CET")
+
+        # A cache from another version of pytz is rebuilt
+        cached["header"]["pytz"] = "2000.1"
+        cached["index"]["cet"] = "Europe/Paris"
+        with open(self.path, "w") as f:
+            json.dump(cached, f)
+        self.assertEqual(abbreviations.load_index()["cet"], "CET")
+        # And one that's up to date is used as it is
+        with open(self.path) as f:
+            cached = json.load(f)
+        cached["index"]["cet"] = "Europe/Paris"
+        with open(self.path, "w") as f:
+            json.dump(cached, f)
+        self.assertEqual(abbreviations.load_index()["cet"], "Europe/Paris")
+
+
+class TestOffsetCache(TestCase):
+    def test_matches_index(self):
+        for name in ("US/Pacific", "Europe/London", "Australia/Lord_Howe",
+                     "UTC"):
+            index = index_for(pytz.timezone(name))
+            offsets = OffsetCache(index)
+            # Every hour through 2012, then backwards through 2011
+            seconds = list(range(1325376000, 1356998400, 3600)) + \
+                list(range(1325376000, 1293840000, -3600))
+            for second in seconds:
+                self.assertEqual(offsets.utc_offset(second),
+                                 index.utc_offset(second))
+                self.assertEqual(offsets.local_offset(second),
+                                 index.local_offset(second))
+
+    def test_windows(self):
+        offsets = OffsetCache(index_for(pytz.timezone("US/Pacific")))
+        offsets.utc_offset(1355164289)
+        # 2012-11-04 09:00 UTC to 2013-03-10 10:00 UTC
+        self.assertEqual(offsets.utc_window[:3],
+                         (1352019600, 1362909600, -8 * 3600))
+        offsets.local_offset(1355164289)
+        self.assertEqual(offsets.local_window,
+                         (1352019600 + 86400, 1362909600 - 86400, -8 * 3600))
+        # Near a transition nothing is remembered
+        offsets.local_offset(1352019600)
+        self.assertEqual(offsets.local_window[:2],
+                         (1352019600 + 86400, 1362909600 - 86400))
+
+    def test_ordered_converter(self):
+        stamps = ["2012-03-11T0{h}:30:00".format(h=h) for h in range(10)]
+        stamps += list(reversed(stamps))
+        for to_tz, from_tz in [("pst", "utc"), ("utc", "pst")]:
+            convert = wtftz.Converter(to_tz, from_tz, naive=False,
+                                      ordered=True)
+            self.assertEqual(
+                [convert(ts) for ts in stamps],
+                [wtftz.convert(ts, to_tz, from_tz, False) for ts in stamps])
+
+
+class TestRenderer(TestCase):
+    def setUp(self):
+        pacific = pytz.timezone("US/Pacific")
+        # Every 7.3 seconds across a DST transition
+        self.stamps = [pacific.normalize(pacific.localize(
+            datetime(2012, 11, 4, 0, 0)) + timedelta(seconds=7.3 * i))
+            for i in range(2000)]
+
+    def test_strftime(self):
+        for fmt in ("%d/%b/%Y:%H:%M:%S %z", "%Y-%m-%dT%H:%M:%S.%f%Z",
+                    "%M%% at %I %p", "%c", "[%s]"):
+            renderer = Renderer(fmt)
+            for ts in self.stamps:
+                self.assertEqual(renderer.render(ts), ts.strftime(fmt))
+
+    def test_flags(self):
+        # glibc's flags, which change the minutes and seconds within an hour
+        for fmt in ("%H:%-M", "%-S", "%_M:%0S", "%-H:%M:%S", "%%-M %-d"):
+            renderer = Renderer(fmt)
+            for ts in self.stamps:
+                self.assertEqual(renderer.render(ts), ts.strftime(fmt))
+        self.assertEqual(
+            list(wtftz.convert_many(["2012-12-10T18:05:29",
+                                     "2012-12-10T18:45:29"], "pst",
+                                    fmt="%H:%-M")),
+            ["10:5", "10:45"])
+
+    def test_str_and_iso(self):
+        for ts in self.stamps[:10] + [datetime(2012, 12, 10, 13, 31, 29)]:
+            self.assertEqual(Renderer().render(ts), str(ts))
+            self.assertEqual(Renderer("iso").render(ts), ts.isoformat())
+
+    def test_epoch(self):
+        renderer = Renderer("epoch")
+        for ts in self.stamps:
+            epoch = (ts - pytz.utc.localize(datetime(1970, 1, 1)))
+            self.assertEqual(float(renderer.render(ts)),
+                             epoch.total_seconds())
+        self.assertEqual(renderer.render(datetime(2012, 12, 10, 13, 31, 29)),
+                         "1355146289")
+
+    @skipIf(zoneinfo is None, "zoneinfo needs Python 3.9")
+    def test_fold(self):
+        # A zoneinfo timezone is the same tzinfo either side of a fold
+        pacific = zoneinfo.ZoneInfo("America/Los_Angeles")
+        stamps = [(datetime(2012, 11, 4, 8, 0) + timedelta(minutes=15 * i))
+                  .replace(tzinfo=pytz.utc).astimezone(pacific)
+                  for i in range(8)]
+        epoch, strftime = Renderer("epoch"), Renderer("%H:%M %z %Z")
+        for ts in stamps:
+            self.assertEqual(epoch.render(ts), str(int(ts.timestamp())))
+            self.assertEqual(strftime.render(ts),
+                             ts.strftime("%H:%M %z %Z"))
+        self.assertEqual(
+            list(wtftz.convert_many(["2012-11-04T08:30:00",
+                                     "2012-11-04T09:30:00"], pacific,
+                                    fmt="epoch")),
+            ["1352017800", "1352021400"])
+
+    def test_render_into(self):
+        buffer = bytearray(b"at ")
+        Renderer("%H:%M").render_into(datetime(2012, 12, 10, 13, 31),
+                                      buffer)
+        self.assertEqual(buffer, b"at 13:31")
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, Renderer, "rfc")
+
+    def test_apis(self):
+        ts = "2012-12-10T18:31:29"
+        self.assertEqual(wtftz.convert(ts, "pst", fmt="iso"),
+                         "2012-12-10T10:31:29")
+        self.assertEqual(wtftz.convert(ts, "pst", fmt="epoch"),
+                         "1355164289")
+        self.assertEqual(wtftz.Converter("pst", fmt="%H:%M")(ts), "10:31")
+        self.assertEqual(
+            list(wtftz.convert_many([ts], "pst", fmt="epoch")),
+            ["1355164289"])
+        self.assertEqual(
+            list(convert_lines([b"x " + ts.encode("ascii") + b" y\n"],
+                               "pst", field=1, fmt="%d/%b/%Y:%H:%M:%S")),
+            [b"x 10/Dec/2012:10:31:29 y\n"])
+
+
+class TestConvertRange(TestCase):
+    zones = ("pst", "Australia/Lord_Howe", "utc")
+
+    def _expected(self, start, stop, step, to_tz, from_tz="utc",
+                  naive=True):
+        expected = []
+        while start < stop if step > timedelta(0) else start > stop:
+            expected.append(wtftz.convert(start, to_tz, from_tz, naive))
+            start += step
+        return expected
+
+    def test_matches_convert(self):
+        for name in ("US/Pacific", "Australia/Lord_Howe", "UTC"):
+            for step in (timedelta(minutes=37, microseconds=3),
+                         timedelta(hours=-3, seconds=-1)):
+                start, stop = datetime(2012, 3, 1), datetime(2012, 12, 1)
+                if step < timedelta(0):
+                    start, stop = stop, start
+                converted = list(wtftz.convert_range(start, stop, step, name,
+                                                     naive=False))
+                self.assertEqual(converted, self._expected(
+                    start, stop, step, name, naive=False))
+                self.assertEqual(
+                    [ts.utcoffset() for ts in converted],
+                    [ts.utcoffset() for ts in self._expected(
+                        start, stop, step, name, naive=False)])
+
+    def test_fold(self):
+        self.assertEqual(
+            [str(ts) for ts in wtftz.convert_range(
+                "2012-11-04T08:00:00", "2012-11-04T10:00:00", 1800, "pst",
+                naive=False)],
+            ["2012-11-04 01:00:00-07:00", "2012-11-04 01:30:00-07:00",
+             "2012-11-04 01:00:00-08:00", "2012-11-04 01:30:00-08:00"])
+
+    def test_gap(self):
+        self.assertEqual(
+            list(wtftz.convert_range("2012-03-11 06:00", "2012-03-11 09:00",
+                                     3600, "est", fmt="%H:%M")),
+            ["01:00", "03:00", "04:00"])
+
+    def test_epoch(self):
+        start, stop = "2012-11-04T08:00:00", "2012-11-04T10:00:00"
+        for name in self.zones:
+            self.assertEqual(
+                list(wtftz.convert_range(start, stop, 1800, name,
+                                         fmt="epoch")),
+                [wtftz.convert(start, name, fmt="epoch"), "1352017800",
+                 "1352019600", "1352021400"])
+
+    def test_from_tz(self):
+        self.assertEqual(
+            list(wtftz.convert_range("2012-12-10 10:00", "2012-12-10 12:00",
+                                     timedelta(hours=1), "est", "pst")),
+            [datetime(2012, 12, 10, 13), datetime(2012, 12, 10, 14)])
+
+    def test_lazy(self):
+        converted = wtftz.convert_range("1970-01-01", "2038-01-01", 1, "pst")
+        self.assertEqual(next(converted), datetime(1969, 12, 31, 16))
+
+    def test_step(self):
+        start, stop = "2012-12-10 10:00:10", "2012-12-10 10:00:00"
+        self.assertRaises(ValueError, wtftz.convert_range, start, stop, 0)
+        self.assertEqual(list(wtftz.convert_range(start, stop, 3)), [])
+        self.assertEqual(
+            list(wtftz.convert_range(start, stop, -3.5)),
+            list(wtftz.convert_range(start, stop, timedelta(0, -3.5))))
+        self.assertEqual(
+            [ts.second for ts in wtftz.convert_range(start, stop, -3.5)],
+            [10, 6, 3])
+
+
+class TestConvertMulti(TestCase):
+    zones = ("pst", "est", "utc", "Australia/Lord_Howe")
+
+    def test_matches_convert(self):
+        for timestamp in ("2012-11-04T08:30:00", "2012-03-11 10:00",
+                          "2012-12-10T18:31:29.214653-08:00",
+                          datetime(2012, 6, 1, 12, 0, 0, 5)):
+            for naive in (True, False):
+                self.assertEqual(
+                    wtftz.convert_multi(timestamp, self.zones, "cet", naive),
+                    dict((zone, wtftz.convert(timestamp, zone, "cet", naive))
+                         for zone in self.zones))
+
+    def test_batch(self):
+        timestamps = ["2012-11-04T08:%02d:00" % i for i in range(60)]
+        self.assertEqual(
+            wtftz.convert_multi(timestamps, self.zones, naive=False),
+            [dict((zone, wtftz.convert(ts, zone, naive=False))
+                  for zone in self.zones) for ts in timestamps])
+        self.assertEqual(wtftz.convert_multi([], self.zones), [])
+
+    def test_fmt(self):
+        self.assertEqual(
+            wtftz.convert_multi("2012-12-10 01:00", ["utc", "jst"], "pst",
+                                fmt="%H:%M"),
+            {"utc": "09:00", "jst": "18:00"})
+        self.assertEqual(
+            wtftz.convert_multi("2012-12-10 01:00", ["utc", "jst"], "pst",
+                                fmt="epoch"),
+            {"utc": "1355130000", "jst": "1355130000"})
+
+    def test_not_pytz(self):
+        self.assertEqual(
+            wtftz.convert_multi("2012-12-10 01:00", ["utc", "jst"],
+                                date_tz.gettz("US/Pacific")),
+            {"utc": datetime(2012, 12, 10, 9), "jst": datetime(2012, 12, 10,
+                                                               18)})
+
+
+class TestRaw(TestCase):
+    def _expected(self, timestamp, to_tz, from_tz="utc"):
+        converted = wtftz.convert(timestamp, to_tz, from_tz, naive=False)
+        offset = converted.utcoffset()
+        utc = converted - offset
+        return ((utc.replace(tzinfo=None) - datetime(1970, 1, 1)) //
+                timedelta(microseconds=1),
+                offset // timedelta(seconds=1))
+
+    def test_matches_convert(self):
+        for timestamp in ("2012-11-04T08:30:00", "2012-11-04T01:30:00",
+                          "2012-03-11T02:30:00.25", "1355164289",
+                          "2012-12-10T18:31:29.214653-08:00"):
+            for to_tz, from_tz in (("pst", "utc"), ("utc", "pst"),
+                                   ("Australia/Lord_Howe", "cet"),
+                                   (date_tz.gettz("US/Pacific"), "est"),
+                                   ("est", date_tz.gettz("Asia/Tokyo"))):
+                self.assertEqual(
+                    wtftz.convert(timestamp, to_tz, from_tz, fmt="raw"),
+                    self._expected(timestamp, to_tz, from_tz))
+
+    def test_many(self):
+        timestamps = ["2012-11-04T0%d:30:00" % hour for hour in range(10)]
+        self.assertEqual(
+            list(wtftz.convert_many(timestamps + ["garbage"], "pst",
+                                    errors="skip", fmt="raw")),
+            [self._expected(ts, "pst") for ts in timestamps])
+
+    def test_memo(self):
+        memo = ConversionMemo()
+        convert = wtftz.Converter("pst", memo=memo, fmt="raw")
+        self.assertEqual(convert("2012-12-10T18:31:29"),
+                         (1355164289000000, -28800))
+        self.assertEqual(convert("2012-12-10T18:31:29"),
+                         (1355164289000000, -28800))
+        self.assertEqual(memo.stats()["last_hits"], 1)
+        # Raw conversions aren't mixed up with datetimes
+        self.assertEqual(wtftz.convert("2012-12-10T18:31:29", "pst",
+                                       memo=memo),
+                         datetime(2012, 12, 10, 10, 31, 29))
+
+    def test_not_text(self):
+        convert = wtftz.Converter("pst", fmt="raw")
+        self.assertRaises(ValueError, convert.render_into,
+                          "2012-12-10T18:31:29", bytearray())
+        self.assertRaises(ValueError, list, convert_lines(
+            [b"2012-12-10T18:31:29\n"], fmt="raw"))
+
+
+class TestConvertInto(TestCase):
+    timestamps = ["2012-11-04T08:30:00", "2012-11-04T09:30:00.5"]
+
+    def test_array(self):
+        epochs, offsets = array("q", [0] * 3), array("q", [0] * 3)
+        self.assertEqual(
+            wtftz.convert_into(self.timestamps, epochs, offsets, "pst"), 2)
+        self.assertEqual(list(epochs),
+                         [1352017800000000, 1352021400500000, 0])
+        self.assertEqual(list(offsets), [-25200, -28800, 0])
+
+    def test_buffers(self):
+        epochs = bytearray(16)
+        self.assertEqual(wtftz.convert_into(self.timestamps, epochs), 2)
+        self.assertEqual(list(array("q", bytes(epochs))),
+                         [1352017800000000, 1352021400500000])
+        self.assertRaises(TypeError, wtftz.convert_into, self.timestamps,
+                          bytes(16))
+
+    def test_wrong_type(self):
+        # Anything but 64 bit integers would be filled with nonsense
+        for buffer in (array("d", [0.0] * 2), array("i", [0] * 2),
+                       array("H", [0] * 2)):
+            self.assertRaises(TypeError, wtftz.convert_into,
+                              self.timestamps, buffer)
+            self.assertRaises(TypeError, wtftz.convert_into,
+                              self.timestamps, array("q", [0] * 2), buffer)
+        self.assertEqual(list(array("d", [0.0] * 2)), [0.0, 0.0])
+
+    def test_full(self):
+        timestamps = iter(self.timestamps + ["2013-01-01"])
+        epochs = array("q", [0])
+        self.assertEqual(wtftz.convert_into(timestamps, epochs), 1)
+        self.assertEqual(wtftz.convert_into(timestamps, epochs), 1)
+        self.assertEqual(list(epochs), [1352021400500000])
+        self.assertEqual(list(timestamps), ["2013-01-01"])
+
+    def test_errors(self):
+        epochs = array("q", [0] * 3)
+        self.assertEqual(wtftz.convert_into(
+            ["garbage"] + self.timestamps, epochs, errors="skip"), 2)
+        self.assertRaises(ValueError, wtftz.convert_into, ["garbage"],
+                          epochs)
+        self.assertRaises(ValueError, wtftz.convert_into, [], epochs,
+                          errors="pass")
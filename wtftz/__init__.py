@@ -1,3 +1,9 @@
+from .converter import Converter
 from .converter import convert
+from .converter import convert_many
+from .converter import convert_into
 from .converter import convert_free
+from .multi import convert_multi
+from .ranges import convert_range
+from .scanner import rewrite
 from ._version import __version__
@@ -0,0 +1,225 @@
+"""Every timezone abbreviation in the pytz database, eg "CET" or "JST".
+
+Abbreviations are often ambiguous, eg "IST" is used in India, Ireland and
+Israel, so each one is resolved to a single timezone by these rules, in
+order:
+
+1. The timezone in `PREFERRED`, or the `preferred` given to `configure`.
+2. A timezone named after the abbreviation, eg "CET".
+3. A timezone that still uses the abbreviation.
+4. A timezone in the earliest of the `prefer_regions` given to
+   `configure`, eg ("Asia/",).
+5. A timezone in `pytz.common_timezones`.
+6. The first timezone alphabetically.
+
+Scanning the database takes a few hundred milliseconds, so the index is
+saved to `abbreviations.json` in `cache_dir()`, and only rebuilt when pytz
+or the rules change. If `cache_dir()` can't be written to, the index is
+rebuilt by each process instead.
+"""
+import json
+import os
+import re
+import tempfile
+import time
+
+import pytz
+
+from .transitions import EPOCH
+
+
+# Bump this when the file format or the rules change.
+FORMAT_VERSION = 1
+
+PREFERRED = {
+    "acdt": "Australia/Adelaide",
+    "acst": "Australia/Adelaide",
+    "adt": "America/Halifax",
+    "aedt": "Australia/Sydney",
+    "aest": "Australia/Sydney",
+    "akdt": "America/Anchorage",
+    "akst": "America/Anchorage",
+    "ast": "America/Halifax",
+    "bst": "Europe/London",
+    "cat": "Africa/Maputo",
+    "cdt": "America/Chicago",
+    "cst": "America/Chicago",
+    "cest": "CET",
+    "eat": "Africa/Nairobi",
+    "edt": "America/New_York",
+    "est": "America/New_York",
+    "eest": "EET",
+    "hkt": "Asia/Hong_Kong",
+    "hst": "Pacific/Honolulu",
+    "idt": "Asia/Jerusalem",
+    "ist": "Asia/Kolkata",
+    "jst": "Asia/Tokyo",
+    "kst": "Asia/Seoul",
+    "mdt": "America/Denver",
+    "mst": "America/Denver",
+    "msk": "Europe/Moscow",
+    "ndt": "America/St_Johns",
+    "nst": "America/St_Johns",
+    "nzdt": "Pacific/Auckland",
+    "nzst": "Pacific/Auckland",
+    "sast": "Africa/Johannesburg",
+    "sst": "Pacific/Pago_Pago",
+    "wat": "Africa/Lagos",
+    "west": "WET",
+}
+
+# Numeric abbreviations like "+03" aren't names, and "LMT" is local mean
+# time, which every timezone has.
+_ABBREVIATION = re.compile(r"^[A-Za-z]{2,6}$")
+_IGNORED = frozenset(["lmt"])
+# Abbreviations that went out of use before the epoch won't be in any logs.
+_SINCE = 0
+
+_rules = {"preferred": PREFERRED, "prefer_regions": []}
+_index = None
+
+
+def cache_dir():
+    """The directory for the cached index.
+
+    `$WTFTZ_CACHE_DIR` if it's set, otherwise `wtftz` in `$XDG_CACHE_HOME`
+    or `~/.cache`.
+    """
+    return os.environ.get("WTFTZ_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or
+        os.path.join(os.path.expanduser("~"), ".cache"), "wtftz")
+
+
+def lookup(name):
+    """Get the name of the timezone an abbreviation means, or None."""
+    global _index
+    if _index is None:
+        _index = load_index(**_rules)
+    return _index.get(name.lower())
+
+
+def configure(preferred=None, prefer_regions=()):
+    """Change the rules for ambiguous abbreviations.
+
+    Args:
+        preferred: A dict of lowercase abbreviations to the timezone each
+                   should mean, on top of `PREFERRED`.
+        prefer_regions: Timezone name prefixes, eg ("Asia/", "Europe/"), to
+                        prefer for an ambiguous abbreviation, in order.
+    """
+    global _index
+    rules = dict(PREFERRED)
+    rules.update(preferred or {})
+    _rules["preferred"] = rules
+    _rules["prefer_regions"] = list(prefer_regions)
+    _index = None
+    # Forget any timezones resolved with the old rules.
+    from .converter import tz_cache
+    tz_cache.clear()
+
+
+def load_index(preferred=PREFERRED, prefer_regions=(), path=None):
+    """Load the index from the cache, or build and cache it if it's stale.
+
+    Returns a dict of lowercase abbreviations to timezone names.
+    """
+    path = path or os.path.join(cache_dir(), "abbreviations.json")
+    header = {
+        "format": FORMAT_VERSION,
+        "pytz": pytz.__version__,
+        "preferred": preferred,
+        "prefer_regions": list(prefer_regions),
+    }
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+        if cached.get("header") == header:
+            return cached["index"]
+    except (IOError, OSError, ValueError):
+        pass
+    index = build_index(preferred, prefer_regions)
+    # It's only a cache, so carry on without one if it can't be written
+    if _writable(os.path.dirname(path)):
+        try:
+            _write_atomically(path, json.dumps(
+                {"header": header, "index": index}, sort_keys=True))
+        except (IOError, OSError):
+            pass
+    return index
+
+
+def build_index(preferred=PREFERRED, prefer_regions=()):
+    """Build the index from the pytz database.
+
+    Returns a dict of lowercase abbreviations to timezone names.
+    """
+    now = time.time()
+    common = frozenset(pytz.common_timezones)
+    # abbreviation -> {zone name: still in use}
+    zones = {}
+    for zone in pytz.all_timezones:
+        timezone = pytz.timezone(zone)
+        for abbreviation, current in _abbreviations(timezone, now):
+            uses = zones.setdefault(abbreviation, {})
+            uses[zone] = uses.get(zone, False) or current
+
+    def rank(abbreviation, zone, current):
+        regions = [i for i, region in enumerate(prefer_regions)
+                   if zone.startswith(region)]
+        return (zone != preferred.get(abbreviation),
+                zone.lower() != abbreviation,
+                not current,
+                regions[0] if regions else len(prefer_regions),
+                zone not in common,
+                zone)
+
+    return dict(
+        (abbreviation, min(uses, key=lambda zone: rank(
+            abbreviation, zone, uses[zone])))
+        for abbreviation, uses in zones.items())
+
+
+def _abbreviations(timezone, now):
+    """Yield the (abbreviation, still in use) of every period of a
+    timezone since `_SINCE`."""
+    infos = getattr(timezone, "_transition_info", None)
+    if infos is None:
+        # A fixed offset timezone
+        infos = [(None, None, timezone.tzname(None))]
+        starts = [None]
+    else:
+        starts = [(start - EPOCH).total_seconds()
+                  for start in timezone._utc_transition_times]
+    for i, (_, _, abbreviation) in enumerate(infos):
+        abbreviation = abbreviation.lower()
+        if not _ABBREVIATION.match(abbreviation) or \
+                abbreviation in _IGNORED:
+            continue
+        end = starts[i + 1] if i + 1 < len(starts) else None
+        if end is not None and end < _SINCE:
+            continue
+        yield (abbreviation, end is None or end > now)
+
+
+def _writable(directory):
+    """Check if we could write to a directory, making it first if needed."""
+    while not os.path.exists(directory):
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return False
+        directory = parent
+    return os.path.isdir(directory) and os.access(directory, os.W_OK)
+
+
+def _write_atomically(path, data):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+        os.rename(temp_path, path)
+    except Exception:
+        os.remove(temp_path)
+        raise
@@ -0,0 +1,122 @@
+"""Convert timestamps from asyncio sources without blocking the event loop.
+
+This module needs Python 3.6 or later.
+"""
+import asyncio
+import collections
+
+from .converter import ERROR_POLICIES
+from .converter import _resolve_tz
+from .converter import convert_many
+
+
+async def aconvert_stream(source, to_tz="utc", from_tz="utc", naive=True,
+                          errors="raise", learner=None, chunk_size=256,
+                          max_pending=4, executor=None, fmt=None,
+                          flush_after=0.01):
+    """Convert the timestamps from an async iterable, in order.
+
+    Timestamps are collected into chunks, and each chunk is converted with
+    `convert_many` in an executor. At most `max_pending` chunks are being
+    converted at once; once that many are waiting, we stop reading from
+    `source` until the oldest is done. Chunks are yielded as soon as they're
+    converted, and a chunk that's been waiting `flush_after` seconds for
+    more timestamps, eg from a quiet socket, is converted as it is.
+
+    Args:
+        source: An async iterable of timestamps.
+        to_tz: The timezone you want to end up in.
+        from_tz: The timezone of the original timestamps, if needed.
+        naive: If True, then strip the tzinfo from the converted timestamps,
+               if False then leave it.
+        errors: What to do with a timestamp that cannot be converted, see
+                `convert_many`.
+        learner: An optional `FormatLearner`. Only one chunk is converted
+                 at a time when this is given, since learners aren't
+                 thread-safe.
+        chunk_size: How many timestamps to convert in each executor call.
+        max_pending: How many chunks may be converting at once.
+        executor: The executor to use, defaults to the loop's.
+        fmt: An optional output format, see `wtftz.convert`.
+        flush_after: How long, in seconds, a chunk may wait for more
+                     timestamps before it's converted anyway.
+    Returns an async generator of converted timestamps.
+    """
+    # Resolve the timezones, and check the arguments, up front.
+    if errors not in ERROR_POLICIES:
+        raise ValueError("Unknown error policy {errors}".format(
+            errors=errors))
+    to_timezone = _resolve_tz(to_tz)
+    from_timezone = _resolve_tz(from_tz)
+    if learner is not None:
+        max_pending = 1
+    loop = asyncio.get_event_loop()
+    pending = collections.deque()
+    chunk = []
+    # Set when a chunk is started or converted, or the source is finished.
+    ready = asyncio.Event()
+    # Set when a converted chunk is handed back, making room for another.
+    room = asyncio.Event()
+
+    def wake(future):
+        ready.set()
+
+    def submit():
+        nonlocal chunk
+        future = loop.run_in_executor(executor, _convert_chunk, chunk,
+                                      to_timezone, from_timezone, naive,
+                                      errors, learner, fmt)
+        future.add_done_callback(wake)
+        pending.append(future)
+        chunk = []
+
+    async def read():
+        async for timestamp in source:
+            chunk.append(timestamp)
+            if len(chunk) >= chunk_size:
+                submit()
+            elif len(chunk) == 1:
+                # Start the clock on flushing it
+                ready.set()
+            while len(pending) >= max_pending:
+                room.clear()
+                await room.wait()
+
+    reader = asyncio.ensure_future(read())
+    reader.add_done_callback(wake)
+    try:
+        while True:
+            # Hand back whatever is done, in order, as soon as it's done.
+            while pending and pending[0].done():
+                converted = pending.popleft().result()
+                room.set()
+                for timestamp in converted:
+                    yield timestamp
+            if reader.done():
+                if chunk:
+                    # Convert the last of it, even if the source then failed
+                    submit()
+                elif not pending:
+                    # Raise anything the source raised
+                    reader.result()
+                    return
+            ready.clear()
+            waiting = chunk
+            try:
+                await asyncio.wait_for(
+                    ready.wait(), flush_after if waiting else None)
+            except asyncio.TimeoutError:
+                # The source has gone quiet, so don't hold on to what it has
+                # already sent.
+                if chunk is waiting and len(pending) < max_pending:
+                    submit()
+    finally:
+        reader.cancel()
+        for future in pending:
+            future.cancel()
+
+
+def _convert_chunk(chunk, to_timezone, from_timezone, naive, errors,
+                   learner, fmt):
+    return list(convert_many(chunk, to_timezone, from_timezone, naive,
+                             errors, learner, fmt=fmt))
@@ -0,0 +1,138 @@
+from collections import OrderedDict
+import threading
+
+
+class LRUCache(object):
+    """A bounded, thread-safe, least recently used cache.
+
+    Unlike `functools.lru_cache` this can hold None, so it can remember
+    lookups that failed, and it can be inspected and cleared from outside.
+
+    >>> cache = LRUCache(maxsize=2)
+    >>> cache.get("est") is LRUCache.missing
+    True
+    >>> cache.set("est", None)
+    >>> cache.get("est") is None
+    True
+    >>> cache.stats()
+    {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 2}
+    """
+    missing = object()
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Look up a key.
+
+        Returns the cached value, or `LRUCache.missing` if it isn't cached.
+        """
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return self.missing
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Cache a value, evicting the least recently used if we're full."""
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Forget every cached value and reset the statistics."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Returns a dict of hits, misses, current size and maximum size."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ConversionMemo(object):
+    """A bounded memo of conversions, keyed on the raw timestamp.
+
+    Logs tend to repeat the same timestamp many times in a row, so the last
+    conversion is checked first, before a `LRUCache` of older ones.
+
+    A memo is only worth it for inputs that repeat, and it can be shared
+    between conversions to different timezones. Pickled copies, eg sent to
+    other processes, start out empty.
+
+    >>> memo = ConversionMemo(maxsize=2)
+    >>> memo.set("ts", 1)
+    >>> memo.get("ts"), memo.get("other") is ConversionMemo.missing
+    (1, True)
+    >>> memo.stats()["hit_rate"]
+    0.5
+    """
+    missing = LRUCache.missing
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.last_hits = 0
+        # The last (key, value), swapped as a whole so threads can share it
+        self._last = (self.missing, None)
+        self._cache = LRUCache(maxsize)
+
+    def get(self, key):
+        """Look up a key.
+
+        Returns the remembered value, or `ConversionMemo.missing`.
+        """
+        last_key, value = self._last
+        if last_key == key:
+            self.last_hits += 1
+            return value
+        value = self._cache.get(key)
+        if value is not self.missing:
+            self._last = (key, value)
+        return value
+
+    def set(self, key, value):
+        """Remember a value."""
+        self._last = (key, value)
+        self._cache.set(key, value)
+
+    def clear(self):
+        """Forget everything and reset the statistics."""
+        self._last = (self.missing, None)
+        self.last_hits = 0
+        self._cache.clear()
+
+    def stats(self):
+        """Returns a dict of hits on the last value, hits and misses on the
+        LRU, its size and maximum size, and the overall hit rate."""
+        stats = self._cache.stats()
+        stats["last_hits"] = self.last_hits
+        hits = stats["hits"] + self.last_hits
+        total = hits + stats["misses"]
+        stats["hit_rate"] = float(hits) / total if total else 0.0
+        return stats
+
+    def __reduce__(self):
+        return (ConversionMemo, (self.maxsize,))
+
+    def __len__(self):
+        return len(self._cache)
@@ -0,0 +1,184 @@
+import argparse
+import errno
+import io
+import re
+import signal
+import sys
+
+import wtftz
+from .stream import convert_lines
+
+
+BUFFER_SIZE = 1 << 16
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='WTF Timezones?! Convert a '
+        'time from utc (default) to another tz.')
+    parser.add_argument('time', nargs="?", help="The time to convert")
+    parser.add_argument('to', nargs="?", help="The target timezone")
+    parser.add_argument('from_tz', metavar="from", nargs="?",
+        default="utc", help="The source timezone.")
+    parser.add_argument('--to', dest="to_opt", metavar="TZ",
+        help="The target timezone, instead of the positional argument.")
+    parser.add_argument('--from', dest="from_opt", metavar="TZ",
+        help="The source timezone, instead of the positional argument.")
+    parser.add_argument('--stream', action="store_true",
+        help="Convert the timestamp in every line of stdin.")
+    parser.add_argument('-d', '--delimiter',
+        help="With --stream, the field delimiter. Defaults to whitespace, "
+             "or a comma with --csv.")
+    parser.add_argument('-f', '--field', type=int,
+        help="With --stream, the 0-based index of the timestamp field.")
+    parser.add_argument('-r', '--regex',
+        help="With --stream, a regex matching the timestamp. If it has a "
+             "group, the first group is the timestamp.")
+    parser.add_argument('-i', '--input', metavar="FILE",
+        help="With --stream or --csv, read this file instead of stdin.")
+    parser.add_argument('--csv', action="store_true",
+        help="Convert the --columns of the CSV file on stdin. Use "
+             "--delimiter for other delimited files, eg TSV.")
+    parser.add_argument('--columns', metavar="COLUMNS",
+        help="With --csv, the columns to convert, separated by commas. Each "
+             "can be name, name:to_tz or name:to_tz:from_tz.")
+    parser.add_argument('--serve', action="store_true",
+        help="Run a conversion server on a Unix socket, which the wtftz "
+             "command will use instead of converting for itself.")
+    parser.add_argument('--socket', metavar="PATH",
+        help="With --serve, the socket to listen on. Defaults to "
+             "$WTFTZ_SOCKET, $XDG_RUNTIME_DIR/wtftz.sock or "
+             "$TMPDIR/wtftz-<uid>/wtftz.sock.")
+    parser.add_argument('-j', '--jobs', type=int,
+        help="With --stream and --input, convert the file with this many "
+             "processes.")
+    parser.add_argument('--in-place', metavar="FILE",
+        help="Overwrite the fixed width timestamp on every line of FILE "
+             "with its conversion, without copying the file.")
+    parser.add_argument('--column', type=int, default=0,
+        help="With --in-place, the byte offset of the timestamp in a line.")
+    parser.add_argument('--template', default=None,
+        help="With --in-place, the strptime-style format of the "
+             "timestamps. Defaults to %%Y-%%m-%%dT%%H:%%M:%%S.%%f.")
+    parser.add_argument('--dry-run', action="store_true",
+        help="With --in-place, count what would change without changing it.")
+    parser.add_argument('--journal', metavar="PATH",
+        help="With --in-place, save the original timestamps here first, "
+             "so a crashed rewrite can be undone with --undo.")
+    parser.add_argument('--undo', action="store_true",
+        help="With --in-place and --journal, restore the file from the "
+             "journal of a crashed rewrite.")
+    parser.add_argument('--format', dest="fmt", metavar="FORMAT",
+        help="How to print converted timestamps: str (the default), iso, "
+             "epoch or a strftime pattern, eg %%d/%%b/%%Y:%%H:%%M:%%S.")
+    parser.add_argument('--memo', type=int, metavar="N",
+        help="With --stream or --csv, remember the last N conversions, "
+             "for inputs that repeat the same timestamps.")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    from_tz = args.from_opt or args.from_tz
+    if args.serve:
+        from .server import serve
+        # Clean up the socket when we're killed, too.
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        return serve(args.socket)
+    if args.in_place:
+        if args.undo and not args.journal:
+            parser.error("--undo needs the --journal to restore from")
+        return in_place(args, args.to_opt or "utc", from_tz)
+    if args.csv:
+        if not args.columns:
+            parser.error("--csv needs the --columns to convert")
+        return convert_csv(args, args.to_opt or "utc", from_tz)
+    if args.stream:
+        if args.time or args.to:
+            parser.error("--stream reads timestamps from stdin, use --to "
+                         "and --from for the timezones")
+        if args.jobs and not args.input:
+            parser.error("--jobs needs a file to split, use --input")
+        return stream(args, args.to_opt or "utc", from_tz)
+
+    to_tz = args.to_opt or args.to
+    if not args.time or not to_tz:
+        parser.error("a time and a target timezone are required")
+    try:
+        print(wtftz.convert(args.time, to_tz, from_tz, fmt=args.fmt))
+    except Exception:
+        print(args.time)
+
+
+def stream(args, to_tz, from_tz):
+    """Convert stdin to stdout a line at a time."""
+    if hasattr(signal, "SIGPIPE"):
+        # Die quietly when whatever we're piped into, eg `head`, goes away.
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    delimiter = _to_bytes(args.delimiter)
+    pattern = re.compile(_to_bytes(args.regex)) if args.regex else None
+    options = dict(to_tz=to_tz, from_tz=from_tz, delimiter=delimiter,
+                   field=args.field, pattern=pattern, memo=_memo(args),
+                   fmt=args.fmt)
+    stdout = io.open(sys.stdout.fileno(), "wb", BUFFER_SIZE, closefd=False)
+    try:
+        if args.jobs:
+            from .parallel import convert_file
+            output = convert_file(args.input, args.jobs, **options)
+        elif args.input:
+            output = convert_lines(
+                io.open(args.input, "rb", BUFFER_SIZE), **options)
+        else:
+            output = convert_lines(io.open(
+                sys.stdin.fileno(), "rb", BUFFER_SIZE, closefd=False),
+                **options)
+        for converted in output:
+            stdout.write(converted)
+        stdout.flush()
+    except IOError as e:
+        if e.errno != errno.EPIPE:
+            raise
+
+
+def convert_csv(args, to_tz, from_tz):
+    """Convert columns of a CSV file from stdin, or --input, to stdout."""
+    from .csvconvert import convert_csv, parse_columns
+    if args.input:
+        infile = io.open(args.input, "r", BUFFER_SIZE, newline="")
+    else:
+        infile = io.open(sys.stdin.fileno(), "r", BUFFER_SIZE, newline="",
+                         closefd=False)
+    outfile = io.open(sys.stdout.fileno(), "w", BUFFER_SIZE, newline="",
+                      closefd=False)
+    with infile:
+        convert_csv(infile, outfile, parse_columns(args.columns), to_tz,
+                    from_tz, delimiter=args.delimiter or ",",
+                    memo=_memo(args), fmt=args.fmt)
+    outfile.flush()
+
+
+def in_place(args, to_tz, from_tz):
+    """Rewrite the timestamps in a file where they are."""
+    from . import inplace
+    if args.undo:
+        return inplace.undo(args.in_place, args.journal)
+    rewritten, skipped = inplace.rewrite_file(
+        args.in_place, args.column, args.template or inplace.ISO_TEMPLATE,
+        to_tz, from_tz, dry_run=args.dry_run, journal=args.journal)
+    sys.stderr.write("{verb} {rewritten} timestamps, skipped {skipped} "
+                     "lines\n".format(
+                         verb="Would rewrite" if args.dry_run else "Rewrote",
+                         rewritten=rewritten, skipped=skipped))
+
+
+def _memo(args):
+    if not args.memo:
+        return None
+    from .cache import ConversionMemo
+    return ConversionMemo(args.memo)
+
+
+def _to_bytes(value):
+    if value is None or isinstance(value, bytes):
+        return value
+    return value.encode("latin-1")
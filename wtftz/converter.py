@@ -1,14 +1,34 @@
 import datetime
 
-from dateutil import parser as date_parser
 import pytz
 
+from . import stats
+from .cache import ConversionMemo
+from .cache import LRUCache
+from .formats import fast_parse
+from .formatting import Renderer
 from .timezones import common_timezones
+from .transitions import DAY
+from .transitions import EPOCH
+from .transitions import OffsetCache
+from .transitions import index_for
+from .transitions import local_seconds
 from .parser import free_text
-from .parser import _from
 
 
-def convert(timestamp, to_tz="utc", from_tz="utc", naive=True):
+ERROR_POLICIES = ("raise", "skip", "pass")
+
+# The `fmt` for integers rather than a datetime or text.
+RAW = "raw"
+
+# Resolved timezone names, including the names we couldn't resolve. Use
+# `tz_cache.stats()` to see how well it's doing and `tz_cache.clear()` to
+# reset it.
+tz_cache = LRUCache(maxsize=1024)
+
+
+def convert(timestamp, to_tz="utc", from_tz="utc", naive=True, memo=None,
+            fmt=None):
     """Convert a timestamp from one timezone to another.
 
     Args:
@@ -17,6 +37,12 @@ def convert(timestamp, to_tz="utc", from_tz="utc", naive=True):
         from_tz: The timezone of the original timestamp, if needed.
         naive: If True, then strip the tzinfo from the converted timestamp,
                if False then leave it.
+        memo: An optional `wtftz.cache.ConversionMemo` to remember the
+              conversion in, for timestamps that come up again and again.
+        fmt: If given, return the timestamp as text in this format rather
+             than as a datetime. See `wtftz.formatting.Renderer`. "raw"
+             returns a tuple of integers instead, (utc_epoch_us,
+             offset_seconds), without making any datetimes if it can.
     Returns a timestamp in the requested timezone.
 
     An important caveat is that if you include a timezone offset in the
@@ -30,15 +56,381 @@ def convert(timestamp, to_tz="utc", from_tz="utc", naive=True):
     Then wtftz will use US/Eastern standard time and ignore the 'pst' value
     for `from_tz`.
     """
-    if not to_tz:
-        to_tz = "utc"
-    if not from_tz:
-        from_tz = "utc"
-    from_timezone = common_tz_name_to_real_tz(from_tz) or pytz.UTC
-    to_timezone = common_tz_name_to_real_tz(to_tz) or pytz.UTC
-    timestamp = parse_timestamp(timestamp)
+    from_timezone = _resolve_tz(from_tz)
+    to_timezone = _resolve_tz(to_tz)
+    if fmt is not None:
+        return Converter(to_timezone, from_timezone, naive, memo=memo,
+                         fmt=fmt)(timestamp)
+    if memo is not None:
+        return _memoized(memo, timestamp, to_timezone, from_timezone, naive,
+                         parse_timestamp)
+    return _convert(parse_timestamp(timestamp), to_timezone, from_timezone,
+                    naive)
+
+
+def convert_many(timestamps, to_tz="utc", from_tz="utc", naive=True,
+                 errors="raise", learner=None, memo=None, ordered=True,
+                 fmt=None):
+    """Convert many timestamps from one timezone to another.
+
+    Both timezones are resolved once, up front, rather than once per
+    timestamp, so this is much cheaper than calling `convert` in a loop.
+
+    Args:
+        timestamps: An iterable of timestamps, as accepted by `convert`.
+        to_tz: The timezone you want to end up in.
+        from_tz: The timezone of the original timestamps, if needed.
+        naive: If True, then strip the tzinfo from the converted timestamps,
+               if False then leave it.
+        errors: What to do with a timestamp that cannot be converted.
+                "raise" raises the error, "skip" drops the timestamp and
+                "pass" yields the original value unchanged.
+        learner: An optional `wtftz.learner.FormatLearner` to parse the
+                 timestamps with, for when they all share one format.
+        memo: An optional `wtftz.cache.ConversionMemo`, see `convert`.
+        ordered: Expect the timestamps to be in time order, see `Converter`.
+                 They don't have to be, it's just faster if they are.
+        fmt: An optional output format, see `convert`.
+    Returns a generator of timestamps in the requested timezone.
+
+    >>> list(convert_many(
+    ...     ['2012-12-10T18:31:29', 'garbage'], 'est', errors='pass'))
+    [datetime.datetime(2012, 12, 10, 13, 31, 29), 'garbage']
+    """
+    return Converter(_resolve_tz(to_tz), _resolve_tz(from_tz), naive,
+                     learner, memo, ordered, fmt).many(timestamps, errors)
+
+
+def convert_into(timestamps, epochs, offsets=None, to_tz="utc",
+                 from_tz="utc", errors="raise", learner=None, memo=None,
+                 ordered=True):
+    """Convert many timestamps straight into buffers of integers.
+
+    Each timestamp is converted like `convert` with `fmt="raw"`, and its UTC
+    epoch in microseconds is written to `epochs`, and its UTC offset in
+    seconds in `to_tz` to `offsets`. No datetimes are made along the way
+    when the timezones are from pytz.
+
+    The buffers can be an `array.array("q")`, a NumPy int64 array, a
+    bytearray, or anything else with a writable buffer of 64 bit signed
+    integers, or of bytes to treat as them. Anything else is a TypeError.
+    Conversion stops when they're full, so an iterator of timestamps can be
+    converted a buffer at a time.
+
+    Args:
+        timestamps: An iterable of timestamps, as accepted by `convert`.
+        epochs: The buffer for the UTC epochs, in microseconds.
+        offsets: An optional buffer for the UTC offsets, in seconds.
+        to_tz: The timezone to find the offsets in.
+        from_tz: The timezone of the original timestamps, if needed.
+        errors: What to do with a timestamp that cannot be converted, either
+                "raise" or "skip".
+        learner: An optional `wtftz.learner.FormatLearner`, see
+                 `convert_many`.
+        memo: An optional `wtftz.cache.ConversionMemo`, see `convert`.
+        ordered: Expect the timestamps to be in time order, see `Converter`.
+    Returns how many timestamps were written.
+
+    >>> from array import array
+    >>> epochs, offsets = array("q", [0, 0]), array("q", [0, 0])
+    >>> convert_into(["2012-12-10T18:31:29.5"], epochs, offsets, "est")
+    1
+    >>> epochs, offsets
+    (array('q', [1355164289500000, 0]), array('q', [-18000, 0]))
+    """
+    if errors not in ("raise", "skip"):
+        raise ValueError("Unknown error policy {errors}".format(
+            errors=errors))
+    epochs = _int64s(epochs)
+    size = len(epochs)
+    if offsets is not None:
+        offsets = _int64s(offsets)
+        size = min(size, len(offsets))
+    if not size:
+        return 0
+    count = 0
+    converter = Converter(_resolve_tz(to_tz), _resolve_tz(from_tz),
+                          learner=learner, memo=memo, ordered=ordered,
+                          fmt=RAW)
+    for epoch, offset in converter.many(timestamps, errors):
+        epochs[count] = epoch
+        if offsets is not None:
+            offsets[count] = offset
+        count += 1
+        if count == size:
+            break
+    return count
+
+
+def _int64s(buffer):
+    """A writable view of a buffer as 64 bit integers.
+
+    The buffer has to hold 64 bit signed integers already, or plain bytes,
+    rather than eg floats, which would be filled with nonsense.
+    """
+    view = memoryview(buffer)
+    if view.readonly:
+        raise TypeError("Can't convert into a read-only buffer")
+    if view.format == "q":
+        return view
+    if view.format in ("b", "B", "c") or \
+            (view.format == "l" and view.itemsize == 8):
+        return view.cast("B").cast("q")
+    raise TypeError(
+        "Can't convert into a buffer of {format!r}, it needs 64 bit "
+        "integers or bytes".format(format=view.format))
+
+
+class Converter(object):
+    """A conversion from one timezone to another, ready to use many times.
+
+    Both timezones are resolved once, when the converter is made, rather than
+    on every call like `convert`. Unlike `convert`, an unknown timezone name
+    is an error rather than UTC.
+
+    Args:
+        to_tz: The timezone you want to end up in.
+        from_tz: The timezone of the original timestamps, if needed.
+        naive: If True, then strip the tzinfo from the converted timestamps,
+               if False then leave it.
+        learner: An optional `wtftz.learner.FormatLearner` to parse the
+                 timestamps with, for when they all share one format.
+        memo: An optional `wtftz.cache.ConversionMemo`, see `convert`.
+        ordered: If True, remember each UTC offset and how long it lasts, so
+                 time-ordered timestamps only need a full lookup at a DST
+                 transition. Out of order timestamps still convert
+                 correctly, just not any faster. This makes the converter
+                 stateful, so don't share one between threads.
+        fmt: An optional output format, see `convert`.
+
+    >>> to_est = Converter("est")
+    >>> to_est("2012-12-10T18:31:29")
+    datetime.datetime(2012, 12, 10, 13, 31, 29)
+    """
+    __slots__ = ("to_timezone", "from_timezone", "naive", "memo", "fmt",
+                 "_parse", "_to_index", "_from_index", "_naive", "_renderer",
+                 "_raw")
+
+    def __init__(self, to_tz="utc", from_tz="utc", naive=True, learner=None,
+                 memo=None, ordered=False, fmt=None):
+        self.to_timezone = _resolve_known_tz(to_tz)
+        self.from_timezone = _resolve_known_tz(from_tz)
+        self.naive = naive
+        self.memo = memo
+        self.fmt = fmt
+        self._raw = fmt == RAW
+        self._renderer = None if self._raw else Renderer(fmt or "str")
+        # Epochs need the offset, even if it isn't shown.
+        self._naive = naive and fmt != "epoch"
+        self._parse = learner.parse if learner is not None else \
+            parse_timestamp
+        # None unless we can take the fast path through `_convert`
+        self._to_index = index_for(self.to_timezone)
+        self._from_index = index_for(self.from_timezone)
+        if ordered:
+            # These are drop in replacements for the indexes
+            if self._to_index is not None:
+                self._to_index = OffsetCache(self._to_index)
+            if self._from_index is not None:
+                self._from_index = OffsetCache(self._from_index)
+
+    @classmethod
+    def compile_free(cls, query, naive=True):
+        """Make a converter for the timezones in a `convert_free` query.
+
+        The timestamp in the query is ignored, so it can be anything.
+
+        >>> Converter.compile_free("X from pst to est")("2012-12-10 10:31:29")
+        datetime.datetime(2012, 12, 10, 13, 31, 29)
+        """
+        _, fromz, toz = free_text(query)
+        return cls(toz, fromz, naive)
+
+    def __call__(self, timestamp):
+        """Convert a timestamp, like `convert`."""
+        if self.fmt is None:
+            return self._convert(timestamp)
+        if self._raw:
+            return self._convert_raw(timestamp)
+        return self._renderer.render(self._convert(timestamp))
+
+    def render_into(self, timestamp, buffer):
+        """Convert a timestamp and render it onto the end of a bytearray.
+
+        It's rendered in the `fmt`, or like `str(datetime)` without one.
+        """
+        if self._raw:
+            raise ValueError("Raw conversions can't be rendered as text")
+        self._renderer.render_into(self._convert(timestamp), buffer)
+
+    def _convert(self, timestamp):
+        if self.memo is not None:
+            return _memoized(self.memo, timestamp, self.to_timezone,
+                             self.from_timezone, self._naive, self._parse,
+                             self._to_index, self._from_index)
+        return _convert(self._parse(timestamp), self.to_timezone,
+                        self.from_timezone, self._naive, self._to_index,
+                        self._from_index)
+
+    def _convert_raw(self, timestamp):
+        if self.memo is not None:
+            return _memoized(self.memo, timestamp, self.to_timezone,
+                             self.from_timezone, RAW, self._parse,
+                             self._to_index, self._from_index)
+        return _raw(self._parse(timestamp), self.to_timezone,
+                    self.from_timezone, self._to_index, self._from_index)
+
+    def many(self, timestamps, errors="raise"):
+        """Convert many timestamps, like `convert_many`."""
+        if errors not in ERROR_POLICIES:
+            raise ValueError("Unknown error policy {errors}".format(
+                errors=errors))
+        return self._many(timestamps, errors)
+
+    def _many(self, timestamps, errors):
+        for timestamp in timestamps:
+            try:
+                yield self(timestamp)
+            except Exception:
+                if errors == "raise":
+                    raise
+                elif errors == "pass":
+                    yield timestamp
+
+    def __repr__(self):
+        return "Converter({to!r}, {fromz!r}, naive={naive!r})".format(
+            to=str(self.to_timezone), fromz=str(self.from_timezone),
+            naive=self.naive)
+
+
+def _memoized(memo, timestamp, to_timezone, from_timezone, naive, parse,
+              to_index=False, from_index=False):
+    """Convert a timestamp, remembering the result in a `ConversionMemo`.
+
+    `naive` can also be `RAW`, for a `_raw` conversion.
+    """
+    key = (timestamp, to_timezone, from_timezone, naive)
+    try:
+        converted = memo.get(key)
+    except TypeError:
+        # Unhashable, so there's no remembering it
+        converted = ConversionMemo.missing
+        key = None
+    if converted is ConversionMemo.missing:
+        if naive is RAW:
+            converted = _raw(parse(timestamp), to_timezone, from_timezone,
+                             to_index, from_index)
+        else:
+            converted = _convert(parse(timestamp), to_timezone,
+                                 from_timezone, naive, to_index, from_index)
+        if key is not None:
+            memo.set(key, converted)
+    return converted
+
+
+def _resolve_tz(name):
+    """Resolve a `to_tz` or `from_tz` argument, defaulting to UTC."""
+    if not name:
+        return pytz.UTC
+    return common_tz_name_to_real_tz(name) or pytz.UTC
+
+
+def _resolve_known_tz(name):
+    """Like `_resolve_tz`, but raise ValueError for an unknown name."""
+    if not name:
+        return pytz.UTC
+    timezone = common_tz_name_to_real_tz(name)
+    if timezone is None:
+        raise ValueError("Unknown timezone {name}".format(name=name))
+    return timezone
+
+
+def _convert(timestamp, to_timezone, from_timezone, naive,
+             to_index=False, from_index=False):
+    """Convert an already parsed timestamp between resolved timezones.
+
+    pytz timezones are converted with their `TransitionIndex`, which is a
+    lot cheaper than `localize` and `astimezone`. Anything else falls back
+    to those. Callers that have already looked up the indexes can pass them
+    in, including None for a timezone without one.
+    """
+    if to_index is False:
+        to_index = index_for(to_timezone)
+    if to_index is not None and isinstance(timestamp, datetime.datetime):
+        tzinfo = timestamp.tzinfo
+        if tzinfo is None:
+            if from_index is False:
+                from_index = index_for(from_timezone)
+            if from_index is not None:
+                local = local_seconds(timestamp)
+                utc = local - from_index.local_offset(local)
+                return _from_utc(utc, timestamp.microsecond, to_index, naive)
+        else:
+            offset = timestamp.utcoffset()
+            if offset is not None:
+                utc = local_seconds(timestamp) - \
+                    offset.days * DAY - offset.seconds
+                return _from_utc(utc, timestamp.microsecond, to_index, naive)
+    return _convert_generic(timestamp, to_timezone, from_timezone, naive)
+
+
+def _from_utc(utc, microsecond, to_index, naive):
+    """Build the wall clock datetime for a UTC epoch."""
+    offset, tzinfo = to_index.utc_offset(utc)
+    timestamp = EPOCH + datetime.timedelta(
+        seconds=utc + offset, microseconds=microsecond)
+    if naive:
+        return timestamp
+    return timestamp.replace(tzinfo=tzinfo)
+
+
+def _raw(timestamp, to_timezone, from_timezone, to_index=False,
+         from_index=False):
+    """Like `_convert`, but return (utc_epoch_us, offset_seconds).
+
+    With the `TransitionIndex` fast path these are worked out without making
+    a datetime at all.
+    """
+    if to_index is False:
+        to_index = index_for(to_timezone)
+    utc = None
+    if to_index is not None:
+        utc = _utc_seconds(timestamp, from_timezone, from_index)
+    if utc is None:
+        converted = _convert_generic(timestamp, to_timezone, from_timezone,
+                                     False)
+        offset = converted.utcoffset()
+        offset = offset.days * DAY + offset.seconds
+        utc = local_seconds(converted) - offset
+        return (utc * 1000000 + converted.microsecond, offset)
+    return (utc * 1000000 + timestamp.microsecond,
+            to_index.utc_offset(utc)[0])
+
+
+def _utc_seconds(timestamp, from_timezone, from_index=False):
+    """The whole UTC seconds since the epoch of a parsed timestamp, or None
+    if it needs converting without a `TransitionIndex`."""
+    if not isinstance(timestamp, datetime.datetime):
+        return None
+    if timestamp.tzinfo is None:
+        if from_index is False:
+            from_index = index_for(from_timezone)
+        if from_index is None:
+            return None
+        local = local_seconds(timestamp)
+        return local - from_index.local_offset(local)
+    offset = timestamp.utcoffset()
+    if offset is None:
+        return None
+    return local_seconds(timestamp) - offset.days * DAY - offset.seconds
+
+
+def _convert_generic(timestamp, to_timezone, from_timezone, naive):
     if not hasattr(timestamp, 'tzinfo') or timestamp.tzinfo is None:
-        timestamp = from_timezone.localize(timestamp)
+        if hasattr(from_timezone, 'localize'):
+            timestamp = from_timezone.localize(timestamp)
+        else:
+            timestamp = timestamp.replace(tzinfo=from_timezone)
     timestamp = timestamp.astimezone(to_timezone)
     if naive:
         return timestamp.replace(tzinfo=None)
@@ -69,9 +461,19 @@ def common_tz_name_to_real_tz(name):
     Args:
         name: The name of the timezone. eg "est" or "US/Eastern"
     Returns a tzinfo or None, if the given name is unknown.
+
+    Results, including unknown names, are cached in `tz_cache`.
     """
     if isinstance(name, datetime.tzinfo):
         return name
+    timezone = tz_cache.get(name)
+    if timezone is LRUCache.missing:
+        timezone = _lookup_tz(name)
+        tz_cache.set(name, timezone)
+    return timezone
+
+
+def _lookup_tz(name):
     common_name = name.lower()
     if common_name in common_timezones:
         return common_timezones[common_name]
@@ -79,6 +481,15 @@ def common_tz_name_to_real_tz(name):
         return pytz.timezone(name)
     except Exception:
         pass
+    # Only load the abbreviations if we need them, it's slower than all of
+    # the rest of wtftz put together. They're all 2 to 6 letters, so
+    # anything else can't be one.
+    if not (2 <= len(common_name) <= 6 and common_name.isalpha()):
+        return None
+    from . import abbreviations
+    zone = abbreviations.lookup(common_name)
+    if zone is not None:
+        return pytz.timezone(zone)
     return None
 
 
@@ -87,36 +498,84 @@ def parse_timestamp(timestamp):
 
     Args:
         timestamp: The timestamp you want to parse. Accepts epoch,
-                   isoformat, and anything python-dateutil can handle.
+                   isoformat, RFC-2822, ctime, and anything python-dateutil
+                   can handle.
     Returns a timestamp.
     """
-    orig_timestamp = timestamp
     if isinstance(timestamp, datetime.datetime) or \
             isinstance(timestamp, datetime.time):
         return timestamp
+    if stats.enabled:
+        return _parse_instrumented(timestamp)
+
+    parsed = _parse_epoch(timestamp)
+    if parsed is None:
+        parsed = _parse_fast(timestamp)
+        if parsed is None:
+            parsed = _parse_dateutil(timestamp)
+            if parsed is None:
+                raise ValueError("Cannot parse timestamp {ts}".format(
+                    ts=timestamp))
+    return parsed
+
 
+def _parse_instrumented(timestamp):
+    """`parse_timestamp`, counting and timing each stage in `stats`."""
+    for name, stage in _PARSE_STAGES:
+        start = stats.timer()
+        parsed = stage(timestamp)
+        stats.add_time(name, stats.timer() - start)
+        if parsed is not None:
+            stats.count("parse." + name)
+            return parsed
+    stats.count("parse.failed")
+    raise ValueError("Cannot parse timestamp {ts}".format(ts=timestamp))
+
+
+def _parse_epoch(timestamp):
     try:
         timestamp = float(timestamp)
-        # Must have an epoch
-        try:
-            return datetime.datetime.fromtimestamp(timestamp)
-        except Exception:
-            pass
     except Exception:
-        pass
+        _swallowed()
+        return None
+    # Must have an epoch
+    try:
+        return datetime.datetime.fromtimestamp(timestamp)
+    except Exception:
+        _swallowed()
+    return None
 
+
+def _parse_fast(timestamp):
+    # Most timestamps are in one of a handful of well known formats, which
+    # are much cheaper to parse by hand than with dateutil.
+    parsed = fast_parse(str(timestamp))
+    if parsed is not None:
+        parsed_date, zone = parsed
+        if zone is None:
+            return parsed_date
+        fromz = common_tz_name_to_real_tz(zone)
+        if fromz:
+            return fromz.localize(parsed_date)
+    return None
+
+
+def _parse_dateutil(timestamp):
     timestamp = str(timestamp)
     # We might have a weird timestamp string with a timezone
     # eg: "Mon Dec 10 23:31:50 EST 2012"
     fromz = None
     try:
-        free_ts, free_from = _from(timestamp)
-        if free_from and common_tz_name_to_real_tz(free_from):
+        free_ts, free_from, free_to = free_text(timestamp)
+        if free_from and free_to is None:
             fromz = common_tz_name_to_real_tz(free_from)
-            timestamp = free_ts
+            if fromz:
+                timestamp = free_ts
     except Exception:
-        pass
+        _swallowed()
 
+    # dateutil is slow to import, so only import it if we really need it.
+    from dateutil import parser as date_parser
     try:
         parsed_date = date_parser.parse(timestamp)
         if fromz:
@@ -126,6 +585,19 @@ def parse_timestamp(timestamp):
                 parsed_date = fromz.localize(parsed_date)
         return parsed_date
     except Exception:
-        pass
+        _swallowed()
+    return None
+
+
+def _swallowed():
+    if stats.enabled:
+        stats.count("exceptions")
+
 
-    raise ValueError("Cannot parse timestamp {ts}".format(ts=orig_timestamp))
+# The ways `parse_timestamp` tries to parse a timestamp, in order, for
+# `_parse_instrumented`.
+_PARSE_STAGES = (
+    ("epoch", _parse_epoch),
+    ("fast", _parse_fast),
+    ("dateutil", _parse_dateutil),
+)
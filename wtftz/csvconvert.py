@@ -0,0 +1,101 @@
+"""Convert timestamp columns in CSV and other delimited files.
+
+Rows are read, converted and written one at a time, so a file of any size
+is converted in constant memory.
+"""
+import csv
+import itertools
+
+from .converter import Converter
+from .converter import _resolve_tz
+from .learner import FormatLearner
+
+
+def parse_columns(spec):
+    """Parse a `--columns` option into column specs for `convert_csv`.
+
+    Each column is `name`, `name:to_tz` or `name:to_tz:from_tz`, separated by
+    commas. Leaving out a timezone leaves it to `convert_csv`'s defaults.
+
+    >>> parse_columns("added,changed:pst,gone::est")
+    [('added', None, None), ('changed', 'pst', None), ('gone', None, 'est')]
+    """
+    columns = []
+    for column in spec.split(","):
+        name, to_tz, from_tz = (column.split(":", 2) + [None, None])[:3]
+        columns.append((name, to_tz or None, from_tz or None))
+    return columns
+
+
+def convert_csv(infile, outfile, columns, to_tz="utc", from_tz="utc",
+                naive=True, delimiter=",", memo=None, fmt=None, **fmtparams):
+    """Convert the named timestamp columns of a delimited file.
+
+    The first row must be a header naming the columns. Every other column
+    keeps its value, as does any timestamp that can't be converted. Each
+    column learns its own format with a `FormatLearner`.
+
+    Rows are written back with the `csv` module, so the file is normalised
+    on the way through. Lines end the way the header's did, unless there's
+    a `lineterminator`, and fields are only quoted where they need to be,
+    unless there's a `quoting`. So `"1"` comes out as `1`.
+
+    Args:
+        infile: The file to read, opened in text mode with newline="".
+        outfile: The file to write, opened the same way.
+        columns: The columns to convert. Each is either a name, or a tuple
+                 (name, to_tz, from_tz) where either timezone can be None
+                 to use the default.
+        to_tz: The default timezone you want to end up in.
+        from_tz: The default timezone of the original timestamps, if needed.
+        naive: If True, then strip the tzinfo from the converted timestamps,
+               if False then leave it.
+        delimiter: The field delimiter, eg "\\t" for TSV.
+        memo: An optional `wtftz.cache.ConversionMemo`, shared by every
+              column, see `wtftz.convert`.
+        fmt: The format to write the converted timestamps in, see
+             `wtftz.formatting.Renderer`. Defaults to "str".
+        fmtparams: Any other `csv` dialect options, for reading and writing,
+                   eg `quoting=csv.QUOTE_ALL`.
+    Returns the number of rows converted, not counting the header.
+    """
+    lines = iter(infile)
+    try:
+        first = next(lines)
+    except StopIteration:
+        return 0
+    if "lineterminator" not in fmtparams:
+        fmtparams["lineterminator"] = "\r\n" if first.endswith("\r\n") \
+            else "\n"
+    reader = csv.reader(itertools.chain([first], lines),
+                        delimiter=delimiter, **fmtparams)
+    writer = csv.writer(outfile, delimiter=delimiter, **fmtparams)
+    header = next(reader)
+    writer.writerow(header)
+
+    default_to = _resolve_tz(to_tz)
+    default_from = _resolve_tz(from_tz)
+    converters = []
+    for column in columns:
+        if isinstance(column, str):
+            column = (column, None, None)
+        name, column_to, column_from = column
+        if name not in header:
+            raise ValueError("No column named {name}".format(name=name))
+        converters.append((header.index(name), Converter(
+            _resolve_tz(column_to) if column_to else default_to,
+            _resolve_tz(column_from) if column_from else default_from,
+            naive, FormatLearner(), memo, ordered=True, fmt=fmt or "str")))
+
+    rows = 0
+    for row in reader:
+        for index, convert in converters:
+            if index >= len(row) or not row[index]:
+                continue
+            try:
+                row[index] = convert(row[index])
+            except Exception:
+                pass
+        writer.writerow(row)
+        rows += 1
+    return rows
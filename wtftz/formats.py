@@ -0,0 +1,298 @@
+import datetime
+import re
+
+import pytz
+
+
+MONTHS = dict((name, number) for number, name in enumerate(
+    ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+     "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], 1))
+
+_DAY = r"(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun)"
+_MONTH = r"(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)"
+
+_ISO8601 = re.compile(
+    r"(\d{4})-(\d\d)-(\d\d)"
+    r"(?:[T ](\d\d):(\d\d)(?::(\d\d)(?:[.,](\d+))?)?"
+    r"(Z|[+-]\d\d(?::?\d\d)?)?)?$")
+_RFC2822 = re.compile(
+    r"(?:" + _DAY + r", )?(\d{1,2}) " + _MONTH + r" (\d{4}) "
+    r"(\d\d):(\d\d)(?::(\d\d))? (?:([+-]\d{4})|([A-Za-z]{1,5}))$")
+_CTIME = re.compile(
+    _DAY + r" " + _MONTH + r" +(\d{1,2}) (\d\d):(\d\d):(\d\d)"
+    r"(?: ([A-Za-z]{2,5}))? (\d{4})$")
+_SLASHED = re.compile(
+    r"(\d{4})/(\d{1,2})/(\d{1,2})"
+    r"(?: (\d{1,2}):(\d\d)(?::(\d\d)(?:\.(\d+))?)?)?$")
+
+
+def fast_parse(timestamp):
+    """Parse the timestamp formats we see most often, without dateutil.
+
+    Args:
+        timestamp: The timestamp string you want to parse.
+    Returns a tuple (datetime, zone_name), or None if the timestamp isn't in
+    one of the known formats. `zone_name` is a timezone abbreviation found in
+    the timestamp that the caller must resolve and localize to, or None.
+
+    The first few characters pick which parser to try, so a timestamp is
+    only ever matched against one pattern.
+
+    >>> fast_parse("2012-12-23T14:23:03.826437Z")
+    (datetime.datetime(2012, 12, 23, 14, 23, 3, 826437, tzinfo=<UTC>), None)
+    >>> fast_parse("Mon Dec 10 23:31:50 EST 2012")
+    (datetime.datetime(2012, 12, 10, 23, 31, 50), 'EST')
+    """
+    timestamp = timestamp.strip()
+    if len(timestamp) < 8:
+        return None
+    first = timestamp[0]
+    try:
+        if first.isdigit():
+            if timestamp[4] == "-":
+                return parse_iso8601(timestamp)
+            elif timestamp[4] == "/":
+                return parse_slashed(timestamp)
+            return parse_rfc2822(timestamp)
+        elif first.isalpha():
+            if timestamp[3] == ",":
+                return parse_rfc2822(timestamp)
+            return parse_ctime(timestamp)
+    except ValueError:
+        # The timestamp had the right shape but impossible values, such as
+        # a 13th month. Let the caller's fallback decide what to do.
+        pass
+    return None
+
+
+def parse_iso8601(timestamp):
+    """Parse an ISO-8601 or RFC-3339 timestamp.
+
+    eg: "2012-12-23T14:23:03.826437-05:00" or "2012-12-23 14:23:03"
+    """
+    match = _ISO8601.match(timestamp)
+    if not match:
+        return None
+    (year, month, day, hour, minute, second, fraction,
+     offset) = match.groups()
+    tzinfo = None
+    if offset == "Z":
+        tzinfo = pytz.utc
+    elif offset:
+        tzinfo = _fixed_offset(offset[0], offset[1:3], offset[-2:]
+                               if len(offset) > 3 else "00")
+    return (datetime.datetime(
+        int(year), int(month), int(day), int(hour or 0), int(minute or 0),
+        int(second or 0), _microseconds(fraction), tzinfo), None)
+
+
+def parse_rfc2822(timestamp):
+    """Parse an RFC-2822 timestamp, as used in email and HTTP headers.
+
+    eg: "Mon, 10 Dec 2012 23:31:50 -0500" or "10 Dec 2012 23:31:50 GMT"
+    """
+    match = _RFC2822.match(timestamp)
+    if not match:
+        return None
+    day, month, year, hour, minute, second, offset, zone = match.groups()
+    parsed = datetime.datetime(
+        int(year), MONTHS[month], int(day), int(hour), int(minute),
+        int(second or 0))
+    if offset:
+        return (parsed.replace(tzinfo=_fixed_offset(
+            offset[0], offset[1:3], offset[3:5])), None)
+    if zone.upper() in ("UT", "GMT", "Z"):
+        return (parsed.replace(tzinfo=pytz.utc), None)
+    return (parsed, zone)
+
+
+def parse_ctime(timestamp):
+    """Parse `ctime` or `date(1)` output, with or without a timezone.
+
+    eg: "Mon Dec 10 23:31:50 EST 2012" or "Mon Dec 10 23:31:50 2012"
+    """
+    match = _CTIME.match(timestamp)
+    if not match:
+        return None
+    month, day, hour, minute, second, zone, year = match.groups()
+    return (datetime.datetime(
+        int(year), MONTHS[month], int(day), int(hour), int(minute),
+        int(second)), zone)
+
+
+def parse_slashed(timestamp):
+    """Parse a slash separated date, with an optional time.
+
+    eg: "2012/10/7 12:25:46"
+    """
+    match = _SLASHED.match(timestamp)
+    if not match:
+        return None
+    year, month, day, hour, minute, second, fraction = match.groups()
+    return (datetime.datetime(
+        int(year), int(month), int(day), int(hour or 0), int(minute or 0),
+        int(second or 0), _microseconds(fraction)), None)
+
+
+def _microseconds(fraction):
+    if not fraction:
+        return 0
+    return int(fraction[:6].ljust(6, "0"))
+
+
+def _fixed_offset(sign, hours, minutes):
+    offset = int(hours) * 60 + int(minutes)
+    if sign == "-":
+        offset = -offset
+    return pytz.FixedOffset(offset)
+
+
+# The templates `Template.candidates` will try, in order of preference.
+TEMPLATES = [
+    "%Y-%m-%dT%H:%M:%S.%f%z",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f%z",
+    "%Y-%m-%d %H:%M:%S%z",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%a, %d %b %Y %H:%M:%S %z",
+    "%a, %d %b %Y %H:%M:%S %Z",
+    "%d %b %Y %H:%M:%S %z",
+    "%d %b %Y %H:%M:%S %Z",
+    "%d %b %Y %H:%M:%S",
+    "%a %b %d %H:%M:%S %Z %Y",
+    "%a %b %d %H:%M:%S %Y",
+    "%Y/%m/%d %H:%M:%S.%f",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d",
+    "%m/%d/%Y %I:%M:%S %p",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y",
+    "%s",
+]
+
+_DIRECTIVES = {
+    "Y": ("year", r"(\d{4})"),
+    "m": ("month", r"(\d{1,2})"),
+    "d": ("day", r"( ?\d{1,2})"),
+    "H": ("hour", r"(\d{1,2})"),
+    "I": ("hour", r"(\d{1,2})"),
+    "M": ("minute", r"(\d\d)"),
+    "S": ("second", r"(\d\d)"),
+    "f": ("fraction", r"(\d{1,9})"),
+    "b": ("month_name", _MONTH),
+    "a": ("day_name", r"(" + _DAY + r")"),
+    "p": ("ampm", r"(AM|PM|am|pm)"),
+    "z": ("offset", r"(Z|[+-]\d\d:?\d\d)"),
+    "Z": ("zone", r"([A-Za-z]{1,5})"),
+    "s": ("epoch", r"(\d+(?:\.\d+)?)"),
+}
+
+
+class Template(object):
+    """A compiled, strptime-like timestamp template.
+
+    Templates only understand the directives in `_DIRECTIVES`, but they are
+    compiled once into a single regex, so applying one is much cheaper than
+    `datetime.strptime` or dateutil.
+
+    >>> Template("%a %b %d %H:%M:%S %Z %Y").parse(
+    ...     "Mon Dec 10 23:31:50 EST 2012")
+    (datetime.datetime(2012, 12, 10, 23, 31, 50), 'EST')
+    """
+    def __init__(self, template):
+        self.template = template
+        self._fields = []
+        pattern = []
+        chars = iter(template)
+        for char in chars:
+            if char != "%":
+                pattern.append(re.escape(char))
+                continue
+            directive = next(chars, "%")
+            if directive == "%":
+                pattern.append("%")
+                continue
+            if directive not in _DIRECTIVES:
+                raise ValueError("Unsupported directive %{directive}".format(
+                    directive=directive))
+            field, regex = _DIRECTIVES[directive]
+            self._fields.append(field)
+            pattern.append(regex)
+        self._pattern = re.compile("".join(pattern) + "$")
+
+    def __repr__(self):
+        return "Template({template!r})".format(template=self.template)
+
+    def parse(self, timestamp):
+        """Parse a timestamp that matches this template.
+
+        Args:
+            timestamp: The timestamp string you want to parse.
+        Returns a tuple (datetime, zone_name) like `fast_parse`, or None if
+        the timestamp doesn't match.
+        """
+        match = self._pattern.match(timestamp.strip())
+        if not match:
+            return None
+        fields = dict(zip(self._fields, match.groups()))
+        try:
+            return self._build(fields)
+        except ValueError:
+            return None
+
+    def _build(self, fields):
+        if "epoch" in fields:
+            return (datetime.datetime.fromtimestamp(
+                float(fields["epoch"])), None)
+        if "month_name" in fields:
+            month = MONTHS[fields["month_name"]]
+        else:
+            month = int(fields["month"])
+        hour = int(fields.get("hour", 0))
+        ampm = fields.get("ampm")
+        if ampm:
+            if not 1 <= hour <= 12:
+                raise ValueError("Bad 12 hour clock hour {hour}".format(
+                    hour=hour))
+            hour = hour % 12 + (12 if ampm.lower() == "pm" else 0)
+        tzinfo = None
+        offset = fields.get("offset")
+        if offset == "Z":
+            tzinfo = pytz.utc
+        elif offset:
+            tzinfo = _fixed_offset(offset[0], offset[1:3], offset[-2:])
+        return (datetime.datetime(
+            int(fields["year"]), month, int(fields["day"]), hour,
+            int(fields.get("minute", 0)), int(fields.get("second", 0)),
+            _microseconds(fields.get("fraction")), tzinfo),
+            fields.get("zone"))
+
+    @classmethod
+    def candidates(cls, timestamp):
+        """Find the templates in `TEMPLATES` that match a timestamp.
+
+        Args:
+            timestamp: The timestamp string to match.
+        Returns a list of (template, parsed) pairs, in order of preference,
+        where `parsed` is what the template made of the timestamp.
+        """
+        matches = []
+        for template in _compiled_templates():
+            parsed = template.parse(timestamp)
+            if parsed is not None:
+                matches.append((template, parsed))
+        return matches
+
+
+_templates = []
+
+
+def _compiled_templates():
+    if not _templates:
+        _templates.extend(Template(template) for template in TEMPLATES)
+    return _templates
@@ -0,0 +1,182 @@
+"""Render lots of converted timestamps as text, quickly.
+
+Consecutive timestamps in a log are usually in the same hour, so for
+strftime patterns and epochs everything but the minutes, seconds and
+microseconds is rendered once per hour and reused. `str` and `isoformat` are
+already as quick as that, so they're used as they are.
+"""
+import datetime
+from operator import attrgetter
+import re
+
+from .transitions import DAY
+from .transitions import local_seconds
+
+
+# Named formats. Anything with a "%" in it is a strftime pattern.
+FORMATS = ("str", "iso", "epoch")
+
+# The parts of a format that change within an hour.
+_MINUTE, _SECOND, _MICROSECOND = range(3)
+_FAST_DIRECTIVES = {"M": _MINUTE, "S": _SECOND, "f": _MICROSECOND}
+# A directive, with any glibc flag, eg "%-M" for minutes without padding.
+_DIRECTIVE = re.compile(r"%([-_0^#]?)(.)")
+# These include the minutes or seconds, so can't be rendered once an hour.
+_SLOW_DIRECTIVES = frozenset("cXTrRsEO+")
+# How each of those is filled in.
+_PLACEHOLDERS = {
+    _MINUTE: (b"%02d", "minute"),
+    _SECOND: (b"%02d", "second"),
+    _MICROSECOND: (b"%06d", "microsecond"),
+}
+
+
+class Renderer(object):
+    """Render datetimes in one format, reusing the work for each hour.
+
+    Args:
+        fmt: "str" for `str(datetime)`, "iso" for `datetime.isoformat()`,
+             "epoch" for UTC seconds since the epoch, or a strftime pattern.
+
+    Epochs of naive datetimes are as if they were in UTC.
+
+    >>> renderer = Renderer("iso")
+    >>> renderer.render(datetime.datetime(2012, 12, 10, 13, 31, 29))
+    '2012-12-10T13:31:29'
+    >>> Renderer("%d/%b/%Y:%H:%M:%S").render(
+    ...     datetime.datetime(2012, 12, 10, 13, 31, 29))
+    '10/Dec/2012:13:31:29'
+    >>> Renderer("epoch").render(datetime.datetime(2012, 12, 10, 13, 31, 29))
+    '1355146289'
+    """
+    __slots__ = ("fmt", "_parts", "_direct", "_key", "_template", "_fields",
+                 "_epoch")
+
+    def __init__(self, fmt="str"):
+        self.fmt = fmt
+        # How to render a datetime without any reuse, if that's the way
+        self._direct = None
+        self._parts = None
+        if fmt == "str":
+            self._direct = str
+        elif fmt == "iso":
+            self._direct = datetime.datetime.isoformat
+        elif fmt == "epoch":
+            pass
+        elif "%" in fmt:
+            self._parts = _strftime_parts(fmt)
+            if self._parts is None:
+                self._direct = _strftime(fmt)
+        else:
+            raise ValueError(
+                "Unknown format {fmt}, expected one of {formats} or a "
+                "strftime pattern".format(
+                    fmt=fmt, formats=", ".join(FORMATS)))
+        self._key = None
+        self._template = None
+        self._fields = None
+        self._epoch = None
+
+    def render(self, timestamp):
+        """Render a datetime as a str."""
+        buffer = bytearray()
+        self.render_into(timestamp, buffer)
+        return buffer.decode("utf-8")
+
+    def render_into(self, timestamp, buffer):
+        """Render a datetime onto the end of a bytearray."""
+        if self._direct is not None:
+            buffer += self._direct(timestamp).encode("utf-8")
+            return
+        # Unlike pytz's, other tzinfos are the same either side of a DST
+        # fold, so the hour is repeated with a different offset
+        key = (timestamp.hour, timestamp.day, timestamp.month,
+               timestamp.year, timestamp.tzinfo, getattr(timestamp, "fold", 0))
+        if key != self._key:
+            self._start_hour(timestamp, key)
+        if self._parts is None:
+            buffer += b"%d" % (self._epoch + timestamp.minute * 60 +
+                               timestamp.second)
+            if timestamp.microsecond:
+                buffer += b".%06d" % timestamp.microsecond
+        else:
+            buffer += self._template % self._fields(timestamp)
+
+    def _start_hour(self, timestamp, key):
+        """Render everything that's the same for the rest of the hour."""
+        if self._parts is None:
+            self._epoch = _hour_epoch(timestamp)
+        else:
+            self._template, self._fields = _template([
+                part(timestamp) if callable(part) else part
+                for part in self._parts])
+        self._key = key
+
+    def __repr__(self):
+        return "Renderer({fmt!r})".format(fmt=self.fmt)
+
+
+def _template(parts):
+    """Join rendered parts into a bytes template, and a function to get the
+    fields to fill it in with from a datetime."""
+    template = []
+    fields = []
+    for part in parts:
+        if part.__class__ is int:
+            placeholder, field = _PLACEHOLDERS[part]
+            template.append(placeholder)
+            fields.append(field)
+        else:
+            template.append(part.replace(b"%", b"%%"))
+    if not fields:
+        return (b"".join(template), lambda timestamp: ())
+    return (b"".join(template), attrgetter(*fields) if len(fields) > 1
+            else _single(attrgetter(fields[0])))
+
+
+def _single(getter):
+    return lambda timestamp: (getter(timestamp),)
+
+
+def _hour_epoch(timestamp):
+    """The UTC epoch of the start of a datetime's hour."""
+    seconds = local_seconds(timestamp) - timestamp.minute * 60 - \
+        timestamp.second
+    offset = timestamp.utcoffset()
+    if offset is not None:
+        seconds -= offset.days * DAY + offset.seconds
+    return seconds
+
+
+def _strftime_parts(fmt):
+    """Split a strftime pattern at the directives that change within an
+    hour. Returns None if it can't be split."""
+    parts = []
+    start = 0
+    for match in _DIRECTIVE.finditer(fmt):
+        flag, directive = match.groups()
+        if directive in _SLOW_DIRECTIVES:
+            return None
+        if directive in _FAST_DIRECTIVES:
+            if flag:
+                # Only strftime knows how to render these
+                return None
+            if start < match.start():
+                parts.append(_hourly(fmt[start:match.start()]))
+            parts.append(_FAST_DIRECTIVES[directive])
+            start = match.end()
+    if start < len(fmt):
+        parts.append(_hourly(fmt[start:]))
+    return parts
+
+
+def _hourly(pattern):
+    def render(timestamp):
+        return timestamp.strftime(pattern).encode("utf-8")
+    return render
+
+
+def _strftime(pattern):
+    def render(timestamp):
+        return timestamp.strftime(pattern)
+    return render
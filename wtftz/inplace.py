@@ -0,0 +1,181 @@
+"""Rewrite fixed width timestamps in a file, in place.
+
+When every line has its timestamp at the same column, in a format that
+always has the same width, converting it doesn't change the size of the
+file. So rather than writing a converted copy, the file is memory-mapped
+and each timestamp is overwritten where it is.
+"""
+import datetime
+import errno
+import mmap
+import os
+
+from .converter import Converter
+from .converter import _resolve_tz
+from .converter import common_tz_name_to_real_tz
+from .formats import Template
+
+
+ISO_TEMPLATE = "%Y-%m-%dT%H:%M:%S.%f"
+BATCH_SIZE = 10000
+
+
+def rewrite_file(path, column=0, template=ISO_TEMPLATE, to_tz="utc",
+                 from_tz="utc", dry_run=False, journal=None,
+                 batch_size=BATCH_SIZE):
+    """Convert the fixed width timestamp on every line of a file, in place.
+
+    Conversions are naive, as with `convert`'s default. Lines that are too
+    short, or whose timestamp doesn't parse, or that would convert to a
+    different width, are left alone.
+
+    Args:
+        path: The file to rewrite.
+        column: The byte offset of the timestamp from the start of a line.
+        template: The format of the timestamps, see `wtftz.formats.Template`.
+                  Converted timestamps are written back with `strftime` in
+                  the same format.
+        to_tz: The timezone you want to end up in.
+        from_tz: The timezone of the original timestamps.
+        dry_run: If True, count what would change without changing it.
+        journal: A file to write the original bytes of every timestamp to
+                 before overwriting it. If we crash, `undo` can use it to
+                 put the file back how it was. It's deleted once we're done.
+                 It mustn't exist already, since that means an earlier
+                 rewrite crashed, and converting again would convert some
+                 timestamps twice.
+        batch_size: How many timestamps to journal and write at a time.
+    Returns a tuple (rewritten, skipped) of line counts.
+    """
+    parser = Template(template)
+    width = len(datetime.datetime(2000, 1, 1).strftime(template))
+    convert = Converter(_resolve_tz(to_tz), _resolve_tz(from_tz),
+                        ordered=True)
+    rewritten = skipped = 0
+    with open(path, "rb" if dry_run else "r+b") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return (0, 0)
+        journal_file = _create(journal) if journal and not dry_run \
+            else None
+        view = mmap.mmap(f.fileno(), 0, access=(
+            mmap.ACCESS_READ if dry_run else mmap.ACCESS_WRITE))
+        try:
+            batch = []
+            for start, old in _fields(view, column, width):
+                new = old and _convert_field(old, parser, template, convert)
+                if not new or len(new) != width:
+                    skipped += 1
+                    continue
+                rewritten += 1
+                if new != old and not dry_run:
+                    batch.append((start, old, new))
+                    if len(batch) >= batch_size:
+                        _write_batch(view, batch, journal_file)
+                        batch = []
+            if batch:
+                _write_batch(view, batch, journal_file)
+            if not dry_run:
+                view.flush()
+        finally:
+            view.close()
+            if journal_file is not None:
+                journal_file.close()
+    if journal and not dry_run:
+        os.remove(journal)
+    return (rewritten, skipped)
+
+
+def undo(path, journal):
+    """Put back the original timestamps from a `rewrite_file` journal.
+
+    This is for after a crash, when the journal wasn't deleted. The file is
+    restored to how it was before `rewrite_file` started, so it can be run
+    again. Records are replayed newest first, so if a timestamp was somehow
+    journaled more than once, the oldest bytes win.
+    """
+    with open(path, "r+b") as f, open(journal, "rb") as records:
+        view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE)
+        try:
+            for offset, old in _records(records):
+                view[offset:offset + len(old)] = old
+            view.flush()
+        finally:
+            view.close()
+    os.remove(journal)
+
+
+def _records(records):
+    """Yield the (offset, original bytes) in a journal, newest first."""
+    if os.fstat(records.fileno()).st_size == 0:
+        return
+    journal = mmap.mmap(records.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        # Anything after the last newline is a record we crashed while
+        # writing, so the timestamp it's for hasn't been overwritten yet.
+        end = journal.rfind(b"\n")
+        while end >= 0:
+            start = journal.rfind(b"\n", 0, end) + 1
+            offset, _, old = journal[start:end].partition(b"\t")
+            yield (int(offset), old)
+            end = start - 1
+    finally:
+        journal.close()
+
+
+def _create(journal):
+    """Open a new journal, refusing to reuse one from a crashed rewrite."""
+    try:
+        fd = os.open(journal, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+        raise RuntimeError(
+            "The journal {journal} is left over from a rewrite that didn't "
+            "finish. Put the file back with --undo first.".format(
+                journal=journal))
+    return os.fdopen(fd, "wb")
+
+
+def _fields(view, column, width):
+    """Find the fixed width field on each line, without copying the lines.
+
+    Returns a generator of (offset, field bytes), with None for the field of
+    a line that's too short to have one.
+    """
+    size = len(view)
+    start = 0
+    while start < size:
+        end = view.find(b"\n", start)
+        if end < 0:
+            end = size
+        field_start = start + column
+        if field_start + width <= end:
+            yield (field_start, view[field_start:field_start + width])
+        else:
+            yield (field_start, None)
+        start = end + 1
+
+
+def _convert_field(field, parser, template, convert):
+    parsed = parser.parse(field.decode("latin-1"))
+    if parsed is None:
+        return None
+    timestamp, zone = parsed
+    if zone is not None:
+        fromz = common_tz_name_to_real_tz(zone)
+        if not fromz:
+            return None
+        timestamp = fromz.localize(timestamp)
+    return convert(timestamp).strftime(template).encode("latin-1")
+
+
+def _write_batch(view, batch, journal_file):
+    """Journal a batch of changes, then make them."""
+    if journal_file is not None:
+        journal_file.write(b"".join(
+            str(offset).encode("ascii") + b"\t" + old + b"\n"
+            for offset, old, new in batch))
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+    for offset, old, new in batch:
+        view[offset:offset + len(new)] = new
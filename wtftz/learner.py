@@ -0,0 +1,98 @@
+import datetime
+
+from .converter import common_tz_name_to_real_tz
+from .converter import parse_timestamp
+from .formats import Template
+
+
+class FormatLearner(object):
+    """Learn the format of a homogeneous series of timestamps.
+
+    The first `samples` timestamps are parsed with `parse_timestamp`, and
+    the first template in `wtftz.formats.TEMPLATES` that agrees with every
+    one of them is kept. Every timestamp after that is parsed with the
+    learned template, and only falls back to `parse_timestamp` if it doesn't
+    match.
+
+    >>> learner = FormatLearner(samples=2)
+    >>> stamps = ["2012-12-10 23:31:50", "2012-12-10 23:31:51",
+    ...           "2012-12-10 23:31:52", "Mon Dec 10 23:31:53 2012"]
+    >>> [learner.parse(ts).second for ts in stamps]
+    [50, 51, 52, 53]
+    >>> learner.template
+    Template('%Y-%m-%d %H:%M:%S')
+    >>> learner.hits, learner.fallbacks
+    (1, 1)
+    """
+    def __init__(self, samples=10):
+        self.samples = samples
+        self.template = None
+        self.learning = True
+        self.hits = 0
+        self.fallbacks = 0
+        self._sampled = 0
+        self._candidates = None
+
+    def parse(self, timestamp):
+        """Parse a timestamp, learning its format if we haven't yet.
+
+        Args:
+            timestamp: The timestamp you want to parse.
+        Returns a timestamp, or raises ValueError like `parse_timestamp`.
+        """
+        if isinstance(timestamp, datetime.datetime) or \
+                isinstance(timestamp, datetime.time):
+            return timestamp
+        if self.learning:
+            return self._learn(timestamp)
+        if self.template is not None:
+            parsed = self.template.parse(str(timestamp))
+            if parsed is not None:
+                parsed_date, zone = parsed
+                if zone is None:
+                    self.hits += 1
+                    return parsed_date
+                fromz = common_tz_name_to_real_tz(zone)
+                if fromz:
+                    self.hits += 1
+                    return fromz.localize(parsed_date)
+        self.fallbacks += 1
+        return parse_timestamp(timestamp)
+
+    @property
+    def fallback_rate(self):
+        """The fraction of timestamps parsed after learning that didn't
+        match the learned template."""
+        total = self.hits + self.fallbacks
+        if not total:
+            return 0.0
+        return float(self.fallbacks) / total
+
+    def _learn(self, timestamp):
+        parsed_date = parse_timestamp(timestamp)
+        candidates = []
+        for template, parsed in Template.candidates(str(timestamp)):
+            if self._candidates is not None and \
+                    template not in self._candidates:
+                continue
+            if _same_timestamp(parsed, parsed_date):
+                candidates.append(template)
+        self._candidates = candidates
+        self._sampled += 1
+        if not candidates or self._sampled >= self.samples:
+            self.learning = False
+            if candidates:
+                self.template = candidates[0]
+        return parsed_date
+
+
+def _same_timestamp(parsed, parsed_date):
+    """Check that a template parsed a timestamp like `parse_timestamp`."""
+    template_date, zone = parsed
+    if zone is not None:
+        fromz = common_tz_name_to_real_tz(zone)
+        if not fromz:
+            return False
+        template_date = fromz.localize(template_date)
+    return (template_date == parsed_date and
+            template_date.utcoffset() == parsed_date.utcoffset())
@@ -0,0 +1,66 @@
+from .converter import _convert
+from .converter import _from_utc
+from .converter import _resolve_tz
+from .converter import _utc_seconds
+from .converter import parse_timestamp
+from .formatting import Renderer
+from .transitions import OffsetCache
+from .transitions import index_for
+
+
+def convert_multi(timestamp, to_tzs, from_tz="utc", naive=True, fmt=None):
+    """Convert a timestamp into several timezones at once.
+
+    The timestamp is only parsed, and worked out in UTC, once. Each timezone
+    after that is just its UTC offset, so this is much cheaper than calling
+    `convert` for each one.
+
+    Args:
+        timestamp: The timestamp, as accepted by `convert`, or a list of
+                   them.
+        to_tzs: The timezones you want to end up in.
+        from_tz: The timezone of the timestamp, if needed.
+        naive: If True, then strip the tzinfo from the converted timestamps,
+               if False then leave it.
+        fmt: An optional output format, see `convert`.
+    Returns a dict of each of `to_tzs` to the converted timestamp, or a list
+    of them for a list of timestamps.
+
+    >>> converted = convert_multi("2012-12-10T18:31:29", ["pst", "est"])
+    >>> str(converted["pst"]), str(converted["est"])
+    ('2012-12-10 10:31:29', '2012-12-10 13:31:29')
+    """
+    from_timezone = _resolve_tz(from_tz)
+    from_index = index_for(from_timezone)
+    from_offsets = None if from_index is None else OffsetCache(from_index)
+    if fmt == "epoch":
+        # Epochs of naive datetimes are as if they were in UTC
+        naive = False
+    targets = []
+    for name in to_tzs:
+        to_timezone = _resolve_tz(name)
+        index = index_for(to_timezone)
+        targets.append((
+            name, to_timezone, None if index is None else OffsetCache(index),
+            None if fmt is None else Renderer(fmt)))
+    if isinstance(timestamp, (list, tuple)):
+        return [_convert_multi(parse_timestamp(each), targets, from_timezone,
+                               from_offsets, naive)
+                for each in timestamp]
+    return _convert_multi(parse_timestamp(timestamp), targets, from_timezone,
+                          from_offsets, naive)
+
+
+def _convert_multi(timestamp, targets, from_timezone, from_offsets, naive):
+    utc = _utc_seconds(timestamp, from_timezone, from_offsets)
+    converted = {}
+    for name, to_timezone, offsets, renderer in targets:
+        if utc is None or offsets is None:
+            result = _convert(timestamp, to_timezone, from_timezone, naive,
+                              from_index=from_offsets)
+        else:
+            result = _from_utc(utc, timestamp.microsecond, offsets, naive)
+        converted[name] = result if renderer is None else \
+            renderer.render(result)
+    return converted
+
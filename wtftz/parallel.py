@@ -0,0 +1,105 @@
+import collections
+import mmap
+import multiprocessing
+import os
+
+from .learner import FormatLearner
+from .stream import convert_lines
+
+
+CHUNK_SIZE = 1 << 22
+
+# Each worker process maps the input file once, and keeps its options and
+# learned timestamp format for every chunk it converts.
+_worker = {}
+
+
+def convert_file(path, jobs=None, chunk_size=CHUNK_SIZE, max_pending=None,
+                 **options):
+    """Convert the timestamp in each line of a file, on many cores.
+
+    The file is split into chunks of about `chunk_size` bytes, always on a
+    newline, and the chunks are converted by a pool of `jobs` processes. At
+    most `max_pending` chunks are converting, or converted and waiting to be
+    read, at once, so a slow reader doesn't leave the whole converted file
+    in memory.
+
+    Args:
+        path: The file to convert.
+        jobs: The number of processes to use, defaults to the number of CPUs.
+        chunk_size: The rough size of each chunk, in bytes.
+        max_pending: How many chunks may be in flight at once, defaults to
+                     twice `jobs`.
+        options: Anything else is passed through to
+                 `wtftz.stream.convert_lines`, except `learner`, since
+                 each process learns the format for itself. Each process
+                 gets its own, empty, copy of a `memo`.
+    Returns a generator of converted chunks, as bytes, in the same order as
+    the file.
+    """
+    jobs = jobs or multiprocessing.cpu_count()
+    max_pending = max_pending or 2 * jobs
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        pool = multiprocessing.Pool(
+            jobs, initializer=_init_worker, initargs=(path, options))
+        try:
+            pending = collections.deque()
+            for span in chunk_ranges(view, chunk_size):
+                if len(pending) >= max_pending:
+                    yield pending.popleft().get()
+                pending.append(pool.apply_async(_convert_range, (span,)))
+            while pending:
+                yield pending.popleft().get()
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+    finally:
+        view.close()
+
+
+def chunk_ranges(view, chunk_size=CHUNK_SIZE):
+    """Split a bytes-like view into ranges ending on newlines.
+
+    Args:
+        view: Something with `find` and `len`, eg an mmap or bytes.
+        chunk_size: The rough size of each range.
+    Returns a generator of (start, end) offsets covering the whole view.
+
+    >>> list(chunk_ranges(b"aaa\\nbb\\nc\\n", 2))
+    [(0, 4), (4, 7), (7, 9)]
+    """
+    size = len(view)
+    start = 0
+    while start < size:
+        end = view.find(b"\n", min(start + chunk_size, size) - 1)
+        end = size if end < 0 else end + 1
+        yield (start, end)
+        start = end
+
+
+def _init_worker(path, options):
+    f = open(path, "rb")
+    _worker["view"] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    f.close()
+    _worker["options"] = dict(options, learner=FormatLearner())
+
+
+def _convert_range(span):
+    start, end = span
+    return b"".join(convert_lines(
+        _split_lines(_worker["view"][start:end]), **_worker["options"]))
+
+
+def _split_lines(chunk):
+    """Split on newlines only, like iterating over a file does."""
+    lines = chunk.split(b"\n")
+    last = lines.pop()
+    for line in lines:
+        yield line + b"\n"
+    if last:
+        yield last
@@ -1,99 +1,76 @@
 import re
 
 
+# Queries are scanned once for the `to` and `from` keywords and for words
+# that could be a timezone, eg "EST" or "US/Eastern". Anything else, like
+# the digits of a timestamp, is skipped over by the regex engine.
+_TO, _FROM, _ZONE = 1, 2, 3
+_WORDS = re.compile(r"(?<!\S)(?:(to)|(from)|([A-Za-z/_]{2,}))(?!\S)")
+# Words that look like timezones but are really part of the timestamp.
+_NOT_ZONES = frozenset([
+    "jan", "feb", "mar", "apr", "may", "jun",
+    "jul", "aug", "sep", "oct", "nov", "dec",
+    "january", "february", "march", "april", "june", "july",
+    "august", "september", "october", "november", "december",
+    "mon", "tue", "wed", "thu", "fri", "sat", "sun",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday",
+    "sunday", "am", "pm",
+])
+
+
 def free_text(query):
     """Parse a string into the parameters for `convert`.
 
     Args:
         query - A string with a time, and a source and destination timezone.
     Returns a triplet (timestamp, from_timezone, to_timezone) parsed from
-    the query.
+    the query. Either timezone is None if the query doesn't have one.
+
+    The query is scanned once. Everything after a `to` word is the
+    destination timezone, and everything between a `from` word and the `to`
+    is the source timezone. Without a `from`, the last word before the `to`
+    that looks like a timezone is the source timezone.
 
     Ex:
     >>> free_text("2012-12-23T14:23:03.826437-05:00 to pst")
     ('2012-12-23T14:23:03.826437-05:00', None, 'pst')
-    >>> free_text("2012-12-23T14:23:03.826437 from to pst")
-    ('2012-12-23T14:23:03.826437-05:00', 'est', 'pst')
+    >>> free_text("2012-12-23T14:23:03.826437 from est to pst")
+    ('2012-12-23T14:23:03.826437', 'est', 'pst')
     >>> free_text("Mon Dec 10 23:31:50 EST 2012 to UTC")
-    ("Mon Dec 10 23:31:50 2012", "EST", "UTC")
-    """
-    query, toz = _to(query)
-    query, fromz = _from(query)
-    return (query, fromz, toz)
-
-
-def _to(query):
-    """Try to parse a `to` timezone from the query.
-
-    Args:
-        query - A string with a time, and a source and destination timezone.
-    Returns a tuple (query, to_timezone_string) parsed from the query. The
-    query will be have the `to` timezone removed. If no timezone is found,
-    return (query, None).
-
-    >>> _to("2012-12-23T14:23:03.826437 to pst")
-    ('2012-12-23T14:23:03.826437', 'pst')
-    """
-    pattern = re.compile(r"to ?(.*)")
-    matches = pattern.findall(query)
-    if len(matches) > 0:
-        toz = matches[0]
-        query = pattern.sub("", query, 1)
-        return (query.strip(), toz.strip())
-    else:
-        raise MismatchException()
-
-
-def _from(query):
-    """Extract the `from ...` part of a query.
-
-    Args:
-        query - A string with a time, and a source and destination timezone.
-    Returns a tuple (query, from_timezone_string) parsed from the query. The
-    query will be have the from timezone removed. If no timezone is found,
-    return (query, None).
-
-    >>> _from("2012-12-23T14:23:03.826437 from est")
-    ('2012-12-23T14:23:03.826437', 'est')
-
-    If no `from` keyword is in this query, we will attempt to find a suitable
-    timezone in the query string.
-    """
-    pattern = re.compile(r"from ([A-Za-z/ ]+)")
-    matches = pattern.findall(query)
-    if len(matches) > 0:
-        fromz = matches[0]
-        query = pattern.sub("", query, 1)
-        return (query.strip(), fromz.strip())
-
-    return _implicit_from(query)
-
-
-def _implicit_from(query):
-    """There *is* a source timezone in the query, but no from keyword.
-
-    Args:
-        query - A string with a time, and a source and destination timezone.
-    Returns a triplet (timestamp, from_timezone, to_timezone) parsed from
-    the query.
-
-    >>> _implicit_from("2012-12-23T14:23:03.826437 est")
-    ('2012-12-23T14:23:03.826437', 'est')
-    >>> _implicit_from("Mon Dec 10 23:31:50 EST 2012")
-    ("Mon Dec 10 23:31:50 2012", "EST")
+    ('Mon Dec 10 23:31:50 2012', 'EST', 'UTC')
+    >>> free_text("2012-12-23T14:23:03.826437")
+    ('2012-12-23T14:23:03.826437', None, None)
     """
-    pattern = re.compile(r"^([A-Za-z/]+)$")
-    tokens = query.split(" ")
-    for count, token in enumerate(tokens[::-1]):
-        matches = pattern.findall(token)
-        if len(matches) > 0:
-            fromz = matches[0]
-            if len(fromz) <= 1:
-                continue
-            query = " ".join(tokens[0:len(tokens) - count - 1] +
-                             tokens[len(tokens) - count:])
-            return (query.strip(), fromz.strip())
-    return (query.strip(), None)
+    to_word = from_word = zone_word = None
+    for match in _WORDS.finditer(query):
+        kind = match.lastindex
+        if kind == _TO:
+            to_word = match
+            break
+        if from_word is not None:
+            continue
+        if kind == _FROM:
+            from_word = match
+        elif match.group(_ZONE).lower() not in _NOT_ZONES:
+            zone_word = match
+
+    toz = None
+    end = len(query)
+    if to_word is not None:
+        toz = query[to_word.end():].strip()
+        end = to_word.start()
+
+    if from_word is not None:
+        fromz = query[from_word.end():end].strip()
+        return (query[:from_word.start()].strip(), fromz, toz)
+
+    if zone_word is not None:
+        timestamp = " ".join(part for part in (
+            query[:zone_word.start()].strip(),
+            query[zone_word.end():end].strip()) if part)
+        return (timestamp, zone_word.group(), toz)
+
+    return (query[:end].strip(), None, toz)
 
 
 class MismatchException(Exception):
@@ -0,0 +1,110 @@
+import datetime
+
+import pytz
+
+from .converter import _convert
+from .converter import _resolve_tz
+from .converter import parse_timestamp
+from .formatting import Renderer
+from .transitions import EPOCH
+from .transitions import OffsetCache
+from .transitions import index_for
+from .transitions import local_seconds
+
+
+_MICROSECONDS = 10 ** 6
+
+
+def convert_range(start, stop, step, to_tz="utc", from_tz="utc", naive=True,
+                  fmt=None):
+    """Convert every timestamp in a range, lazily.
+
+    Like `range`, `stop` isn't included and `step` can be negative. Steps are
+    in real time, so they're always the same length even across a DST
+    transition, where the wall clock jumps or repeats.
+
+    Between transitions each timestamp is just the last one plus `step`, so
+    this is much cheaper than converting each one.
+
+    Args:
+        start: The first timestamp, as accepted by `convert`.
+        stop: The timestamp to stop before.
+        step: A timedelta, or a number of seconds.
+        to_tz: The timezone you want to end up in.
+        from_tz: The timezone of `start` and `stop`, if needed.
+        naive: If True, then strip the tzinfo from the converted timestamps,
+               if False then leave it.
+        fmt: An optional output format, see `convert`.
+    Returns a generator of timestamps in the requested timezone.
+
+    >>> [str(ts) for ts in convert_range(
+    ...     "2012-11-04T08:30:00", "2012-11-04T10:00:00", 1800, "pst")]
+    ['2012-11-04 01:30:00', '2012-11-04 01:00:00', '2012-11-04 01:30:00']
+    """
+    if not isinstance(step, datetime.timedelta):
+        step = datetime.timedelta(seconds=step)
+    step_us = (step.days * 86400 + step.seconds) * _MICROSECONDS + \
+        step.microseconds
+    if not step_us:
+        raise ValueError("convert_range step must not be zero")
+    to_timezone = _resolve_tz(to_tz)
+    from_timezone = _resolve_tz(from_tz)
+    if fmt == "epoch":
+        # Epochs of naive datetimes are as if they were in UTC
+        naive = False
+    # Work in integer microseconds since the epoch, in UTC
+    first, last = [
+        _utc_microseconds(_convert(parse_timestamp(timestamp), pytz.UTC,
+                                   from_timezone, True))
+        for timestamp in (start, stop)]
+    index = index_for(to_timezone)
+    if index is None:
+        timestamps = _generic_range(first, last, step_us, to_timezone,
+                                    naive)
+    else:
+        timestamps = _indexed_range(first, last, step, step_us,
+                                    OffsetCache(index), naive)
+    if fmt is None:
+        return timestamps
+    return _render(timestamps, Renderer(fmt))
+
+
+def _indexed_range(position, last, step, step_us, offsets, naive):
+    while position < last if step_us > 0 else position > last:
+        seconds, microseconds = divmod(position, _MICROSECONDS)
+        offset, tzinfo = offsets.utc_offset(seconds)
+        window_start, window_end = offsets.utc_window[:2]
+        # How many steps until we leave the offset's window, or the range
+        if step_us > 0:
+            limit = min(last, window_end * _MICROSECONDS)
+            count = -((position - limit) // step_us)
+        else:
+            limit = max(last, window_start * _MICROSECONDS - 1)
+            count = -((limit - position) // -step_us)
+        timestamp = EPOCH + datetime.timedelta(
+            seconds=seconds + offset, microseconds=microseconds)
+        if not naive:
+            timestamp = timestamp.replace(tzinfo=tzinfo)
+        for _ in range(count):
+            yield timestamp
+            timestamp += step
+        position += count * step_us
+
+
+def _generic_range(position, last, step_us, to_timezone, naive):
+    """For timezones we don't have a `TransitionIndex` for."""
+    while position < last if step_us > 0 else position > last:
+        seconds, microseconds = divmod(position, _MICROSECONDS)
+        utc = EPOCH + datetime.timedelta(seconds=seconds,
+                                         microseconds=microseconds)
+        yield _convert(utc, to_timezone, pytz.UTC, naive)
+        position += step_us
+
+
+def _render(timestamps, renderer):
+    for timestamp in timestamps:
+        yield renderer.render(timestamp)
+
+
+def _utc_microseconds(utc):
+    return local_seconds(utc) * _MICROSECONDS + utc.microsecond
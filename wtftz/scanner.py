@@ -0,0 +1,69 @@
+import re
+
+from .converter import Converter
+from .converter import _resolve_tz
+from .converter import common_tz_name_to_real_tz
+
+
+# Every kind of timestamp we look for, as one pattern, so the text is only
+# scanned once however many kinds there are.
+_DAY = r"(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun)"
+_MONTH = r"(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)"
+TIMESTAMPS = re.compile(
+    r"(?P<iso>(?<![\w.:-])\d{4}-\d\d-\d\d[T ]\d\d:\d\d"
+    r"(?::\d\d(?:[.,]\d{1,9})?)?(?:Z|[+-]\d\d(?::?\d\d)?)?"
+    r"(?![\w:])(?!\.\d)(?: (?P<zone>[A-Z]{2,5})\b)?)"
+    r"|(?P<ctime>\b" + _DAY + " " + _MONTH +
+    r" +\d{1,2} \d\d:\d\d:\d\d(?: [A-Z]{2,5})? \d{4}\b)"
+    r"|(?P<rfc2822>\b" + _DAY + r", \d{1,2} " + _MONTH +
+    r" \d{4} \d\d:\d\d(?::\d\d)? (?:[+-]\d{4}\b|[A-Z]{1,5}\b))"
+    r"|(?P<epoch>(?<![\w.])\d{9,10}(?:\.\d{1,6})?(?!\w)(?!\.\d))")
+
+# Epochs outside of this range are probably just numbers.
+# 2001-09-09 to 2038-01-19.
+EPOCH_RANGE = (10 ** 9, 2 ** 31 - 1)
+
+
+def rewrite(text, to_tz="utc", from_tz="utc", naive=True,
+            epoch_range=EPOCH_RANGE):
+    """Convert every timestamp found in some text.
+
+    Finds ISO-8601 timestamps, `ctime` and `date(1)` output, RFC-2822
+    timestamps and epochs anywhere in the text and replaces each one with
+    its conversion. A timezone abbreviation after an ISO-8601 timestamp, eg
+    "2012-12-10 18:31:29 EST", is used, and replaced, along with it.
+    Anything that can't be converted is left alone.
+
+    Args:
+        text: The text to rewrite.
+        to_tz: The timezone you want to end up in.
+        from_tz: The timezone of timestamps that don't say, if needed.
+        naive: If True, then strip the tzinfo from the converted timestamps,
+               if False then leave it.
+        epoch_range: The (min, max) of the epochs to convert. Numbers outside
+                     of it are left alone.
+    Returns the rewritten text.
+
+    >>> rewrite("Deployed at 2012-12-10T18:31:29Z, rolled back at "
+    ...         "Mon Dec 10 13:45:00 EST 2012", "pst")
+    'Deployed at 2012-12-10 10:31:29, rolled back at 2012-12-10 10:45:00'
+    """
+    convert = Converter(_resolve_tz(to_tz), _resolve_tz(from_tz), naive)
+    low, high = epoch_range
+
+    def replace(match):
+        timestamp = match.group()
+        if match.lastgroup == "epoch" and \
+                not low <= float(timestamp) <= high:
+            return timestamp
+        zone = match.group("zone")
+        word = ""
+        if zone is not None and common_tz_name_to_real_tz(zone) is None:
+            # Just a word after the timestamp, not its timezone
+            timestamp, word = timestamp[:-len(zone) - 1], " " + zone
+        try:
+            return str(convert(timestamp)) + word
+        except Exception:
+            return timestamp + word
+
+    return TIMESTAMPS.sub(replace, text)
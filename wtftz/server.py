@@ -0,0 +1,183 @@
+"""A conversion daemon, for when starting Python costs more than converting.
+
+`wtftz --serve` listens on a Unix domain socket with a line protocol. Each
+request is a line of tab separated fields:
+
+    timestamp<TAB>to_tz[<TAB>from_tz]
+
+and gets back one line, in the same order as the requests:
+
+    ok<TAB>converted timestamp
+    error<TAB>message
+
+Clients can pipeline as many requests as they like on one connection.
+"""
+import os
+import socket
+import stat
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+from .converter import common_tz_name_to_real_tz
+from .converter import convert
+from .timezones import common_timezones
+
+
+BUFFER_SIZE = 1 << 16
+
+
+def default_socket_path():
+    """The socket to use if none is given.
+
+    `$WTFTZ_SOCKET` if it's set, otherwise `wtftz.sock` in
+    `$XDG_RUNTIME_DIR`, or in a private `wtftz-<uid>` directory in `$TMPDIR`.
+    """
+    if os.environ.get("WTFTZ_SOCKET"):
+        return os.environ["WTFTZ_SOCKET"]
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], "wtftz.sock")
+    return os.path.join(os.environ.get("TMPDIR", "/tmp"),
+                        "wtftz-{uid}".format(uid=os.getuid()), "wtftz.sock")
+
+
+def is_trusted(path):
+    """Check that a socket can only have been made by the current user.
+
+    It has to be a socket owned by us, in a directory nobody else can swap
+    it out of, see `is_safe_directory`.
+    """
+    try:
+        info = os.stat(path)
+    except OSError:
+        return False
+    return (stat.S_ISSOCK(info.st_mode) and info.st_uid == os.getuid() and
+            is_safe_directory(os.path.dirname(os.path.abspath(path))))
+
+
+def is_safe_directory(directory):
+    """Check that only the current user can replace files in a directory.
+
+    It has to be ours or root's, and others can't write to it unless it's
+    sticky, like /tmp.
+    """
+    try:
+        info = os.stat(directory)
+    except OSError:
+        return False
+    return info.st_uid in (os.getuid(), 0) and (
+        not info.st_mode & 0o022 or bool(info.st_mode & stat.S_ISVTX))
+
+
+def respond(line):
+    """Handle one request line, as bytes, and return the response line."""
+    fields = line.rstrip(b"\r\n").decode("utf-8", "replace").split("\t")
+    if not 2 <= len(fields) <= 3:
+        return b"error\tExpected timestamp<TAB>to_tz[<TAB>from_tz]\n"
+    try:
+        converted = convert(*fields)
+    except Exception as e:
+        return "error\t{e}\n".format(e=str(e).replace("\n", " ")).encode(
+            "utf-8")
+    return "ok\t{ts}\n".format(ts=converted).encode("utf-8")
+
+
+class ConversionHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        pending = b""
+        while True:
+            data = self.request.recv(BUFFER_SIZE)
+            if not data:
+                return
+            lines = (pending + data).split(b"\n")
+            pending = lines.pop()
+            # Answer everything that arrived together with a single send.
+            self.request.sendall(b"".join(respond(line) for line in lines))
+
+
+class ConversionServer(socketserver.ThreadingMixIn,
+                       socketserver.UnixStreamServer):
+    daemon_threads = True
+    # Clients with a timeout don't wait for room in the listen queue, they
+    # fail straight away, so leave room for bursts of them.
+    request_queue_size = 128
+
+
+def serve(path=None):
+    """Serve conversions on a Unix socket until interrupted."""
+    path = path or default_socket_path()
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory, 0o700)
+    if not is_safe_directory(directory):
+        raise RuntimeError(
+            "Other users could replace the socket in {directory}, so "
+            "clients won't trust it. Use a directory only you can write "
+            "to.".format(directory=directory))
+    if os.path.exists(path):
+        if _is_listening(path):
+            raise RuntimeError(
+                "A server is already listening on {path}".format(path=path))
+        os.remove(path)
+    _warm_up()
+    server = ConversionServer(path, ConversionHandler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+def request(lines, path=None, timeout=5):
+    """Send pipelined requests to a server.
+
+    Args:
+        lines: Request lines, as text, without newlines.
+        path: The server's socket.
+        timeout: Seconds to wait on the server.
+    Returns a list of response lines, as text, without newlines. Raises
+    socket.error if there is no server, or the socket could belong to
+    another user, see `is_trusted`.
+    """
+    path = path or default_socket_path()
+    if not is_trusted(path):
+        raise socket.error(
+            "No trusted wtftz server at {path}".format(path=path))
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(path)
+        client.sendall("".join(line + "\n" for line in lines).encode(
+            "utf-8"))
+        client.shutdown(socket.SHUT_WR)
+        responses = []
+        reader = client.makefile("rb")
+        for _ in lines:
+            responses.append(reader.readline().decode("utf-8").rstrip("\n"))
+        reader.close()
+        return responses
+    finally:
+        client.close()
+
+
+def _is_listening(path):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+        return True
+    except socket.error:
+        return False
+    finally:
+        client.close()
+
+
+def _warm_up():
+    """Load everything a conversion might need before the first request."""
+    for name in common_timezones:
+        common_tz_name_to_real_tz(name)
+    convert("2012-12-10T18:31:29", "pst")
+    convert("7 October 2012 12:25:46", "pst")
@@ -0,0 +1,76 @@
+"""Opt-in counters and timings for wtftz's hot paths.
+
+Nothing is counted until `enable()` is called, and while disabled the only
+cost on the hot paths is checking `stats.enabled`.
+
+>>> import wtftz
+>>> from wtftz import stats
+>>> stats.enable()
+>>> ts = wtftz.convert("2012-12-10T18:31:29", "pst")
+>>> stats.snapshot()["counters"]["parse.fast"]
+1
+>>> stats.disable()
+"""
+import threading
+import time
+
+
+enabled = False
+
+timer = getattr(time, "perf_counter", time.time)
+
+_counters = {}
+_timings = {}
+_lock = threading.Lock()
+
+
+def enable():
+    """Start counting."""
+    global enabled
+    enabled = True
+
+
+def disable():
+    """Stop counting. Anything counted so far is kept."""
+    global enabled
+    enabled = False
+
+
+def reset():
+    """Forget everything counted so far."""
+    with _lock:
+        _counters.clear()
+        _timings.clear()
+
+
+def count(name, n=1):
+    """Add `n` to the counter `name`."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def add_time(stage, seconds):
+    """Add `seconds` to the cumulative time spent in `stage`."""
+    with _lock:
+        _timings[stage] = _timings.get(stage, 0.0) + seconds
+
+
+def snapshot():
+    """Get a copy of everything counted so far.
+
+    Returns a dict with:
+        enabled: Whether we're counting.
+        counters: Counts by name. `parse.<strategy>` counts which strategy
+                  `parse_timestamp` succeeded with, and `exceptions` counts
+                  exceptions that were caught and swallowed on the way.
+        timings: Cumulative seconds spent in each `parse_timestamp` stage.
+        tz_cache: The hits and misses of the timezone name cache.
+    """
+    from .converter import tz_cache
+    with _lock:
+        return {
+            'enabled': enabled,
+            'counters': dict(_counters),
+            'timings': dict(_timings),
+            'tz_cache': tz_cache.stats(),
+        }
@@ -0,0 +1,94 @@
+import re
+
+from .converter import RAW
+from .converter import Converter
+from .converter import _resolve_tz
+from .learner import FormatLearner
+
+
+_FIELDS = re.compile(br"\S+")
+
+
+def convert_lines(lines, to_tz="utc", from_tz="utc", naive=True,
+                  delimiter=None, field=None, pattern=None, learner=None,
+                  memo=None, fmt=None):
+    """Convert the timestamp in each line of a stream of bytes.
+
+    Only the timestamp is replaced, the rest of each line is left exactly as
+    it was. Lines whose timestamp can't be found or converted are passed
+    through unchanged.
+
+    Args:
+        lines: An iterable of lines, as bytes, eg a file opened with "rb".
+        to_tz: The timezone you want to end up in.
+        from_tz: The timezone of the original timestamps, if needed.
+        naive: If True, then strip the tzinfo from the converted timestamps,
+               if False then leave it.
+        delimiter: The bytes separating fields, or None for whitespace.
+        field: The index of the field holding the timestamp. If neither this
+               nor `pattern` is given the whole line is the timestamp.
+        pattern: A bytes regex matching the timestamp. If it has a group,
+                 the first group is the timestamp.
+        learner: The `FormatLearner` to parse the timestamps with. A new one
+                 is used if this isn't given.
+        memo: An optional `wtftz.cache.ConversionMemo`, see
+              `wtftz.convert`.
+        fmt: The format to write the converted timestamps in, see
+             `wtftz.formatting.Renderer`. Defaults to "str". Lines are
+             text, so it can't be "raw".
+    Returns a generator of converted lines.
+
+    >>> list(convert_lines([b"a,2012-12-10T18:31:29,b\\n"], "est",
+    ...                    delimiter=b",", field=1))
+    [b'a,2012-12-10 13:31:29,b\\n']
+    """
+    if fmt == RAW:
+        raise ValueError("Can't write raw conversions into lines")
+    if isinstance(pattern, bytes):
+        pattern = re.compile(pattern)
+    convert = Converter(_resolve_tz(to_tz), _resolve_tz(from_tz), naive,
+                        learner or FormatLearner(), memo, ordered=True,
+                        fmt=fmt)
+    # Each line is built up in here, rather than in a new string each time
+    converted = bytearray()
+    for line in lines:
+        body = line.rstrip(b"\r\n")
+        span = _find_timestamp(body, delimiter, field, pattern)
+        if span is None:
+            yield line
+            continue
+        start, end = span
+        del converted[:]
+        converted += body[:start]
+        try:
+            convert.render_into(body[start:end].decode("latin-1"), converted)
+        except Exception:
+            yield line
+            continue
+        converted += body[end:]
+        converted += line[len(body):]
+        yield bytes(converted)
+
+
+def _find_timestamp(body, delimiter, field, pattern):
+    """Find the (start, end) span of the timestamp in a line, or None."""
+    if pattern is not None:
+        match = pattern.search(body)
+        if not match:
+            return None
+        return match.span(1 if match.lastindex else 0)
+    if field is None:
+        return (0, len(body))
+    if delimiter is None:
+        for count, match in enumerate(_FIELDS.finditer(body)):
+            if count == field:
+                return match.span()
+        return None
+    start = 0
+    for _ in range(field):
+        start = body.find(delimiter, start)
+        if start < 0:
+            return None
+        start += len(delimiter)
+    end = body.find(delimiter, start)
+    return (start, end if end >= 0 else len(body))
@@ -1,21 +1,57 @@
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
 import pytz
 
 
-common_timezones = {
-    'est': pytz.timezone('US/Eastern'),
-    'edt': pytz.timezone('US/Eastern'),
-    'eastern': pytz.timezone('US/Eastern'),
-    'cst': pytz.timezone('US/Central'),
-    'cdt': pytz.timezone('US/Central'),
-    'central': pytz.timezone('US/Central'),
-    'mst': pytz.timezone('US/Mountain'),
-    'mdt': pytz.timezone('US/Mountain'),
-    'mountain': pytz.timezone('US/Mountain'),
-    'pst': pytz.timezone('US/Pacific'),
-    'pdt': pytz.timezone('US/Pacific'),
-    'pacific': pytz.timezone('US/Pacific'),
-    'utc': pytz.utc,
-    'gmt': pytz.utc,
-    'universal': pytz.utc,
-    'one timezone to rule them all': pytz.utc
+class LazyTimezones(Mapping):
+    """A mapping of common names to pytz timezones.
+
+    The timezones are only loaded from the pytz database the first time
+    they're looked up, so importing wtftz doesn't have to load them all.
+    """
+    def __init__(self, names):
+        self._names = names
+        self._zones = {}
+
+    def __getitem__(self, name):
+        try:
+            return self._zones[name]
+        except KeyError:
+            pass
+        zone = self._zones[name] = pytz.timezone(self._names[name])
+        return zone
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+
+# The names of the common timezones, and the pytz timezones they mean.
+common_timezone_names = {
+    'est': 'US/Eastern',
+    'edt': 'US/Eastern',
+    'eastern': 'US/Eastern',
+    'cst': 'US/Central',
+    'cdt': 'US/Central',
+    'central': 'US/Central',
+    'mst': 'US/Mountain',
+    'mdt': 'US/Mountain',
+    'mountain': 'US/Mountain',
+    'pst': 'US/Pacific',
+    'pdt': 'US/Pacific',
+    'pacific': 'US/Pacific',
+    'utc': 'UTC',
+    'gmt': 'UTC',
+    'universal': 'UTC',
+    'one timezone to rule them all': 'UTC'
 }
+
+common_timezones = LazyTimezones(common_timezone_names)
@@ -0,0 +1,206 @@
+from array import array
+from bisect import bisect_right
+import datetime
+
+import pytz
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+DAY = 24 * 60 * 60
+# How far pytz winds the clock back to get out of a non-existent time.
+_GAP = 6 * 60 * 60
+_STATIC = (pytz.tzinfo.StaticTzInfo, type(pytz.utc), pytz._FixedOffset)
+_FOREVER = float("inf")
+_FOREVER_AGO = float("-inf")
+
+# The transition indexes, by timezone, built the first time they're needed.
+_indexes = {}
+
+
+class TransitionIndex(object):
+    """A compact index of a timezone's UTC offset transitions.
+
+    `offsets[i]` is the UTC offset, in seconds, from the UTC epoch
+    `transitions[i]` until the next transition, `dst[i]` says whether it is
+    daylight saving time and `tzinfos[i]` is the matching pytz tzinfo. Any
+    UTC offset lookup is a single binary search.
+
+    >>> index = TransitionIndex(pytz.timezone("US/Pacific"))
+    >>> index.utc_offset(1355164289)[0] // 3600
+    -8
+    >>> index.local_offset(1355135489) // 3600
+    -8
+    """
+    __slots__ = ("transitions", "offsets", "dst", "tzinfos")
+
+    def __init__(self, timezone):
+        if hasattr(timezone, "_utc_transition_times"):
+            info = timezone._transition_info
+            self.transitions = array("q", [
+                _seconds(when - EPOCH)
+                for when in timezone._utc_transition_times])
+            self.offsets = array("l", [
+                _seconds(offset) for offset, dst, name in info])
+            self.dst = array("b", [bool(dst) for offset, dst, name in info])
+            self.tzinfos = [timezone._tzinfos[inf] for inf in info]
+        else:
+            self.transitions = array("q", [_seconds(
+                datetime.datetime.min - EPOCH)])
+            self.offsets = array("l", [_seconds(timezone.utcoffset(None))])
+            self.dst = array("b", [False])
+            self.tzinfos = [timezone]
+
+    def utc_offset(self, utc):
+        """Find the UTC offset at a UTC epoch.
+
+        Args:
+            utc: Seconds since the epoch, in UTC.
+        Returns a tuple (offset_seconds, tzinfo).
+        """
+        index = bisect_right(self.transitions, utc) - 1
+        if index < 0:
+            index = 0
+        return (self.offsets[index], self.tzinfos[index])
+
+    def local_offset(self, local):
+        """Find the UTC offset of a wall clock time.
+
+        This makes the same choices as pytz's `localize` with `is_dst=False`.
+        Only the offsets a day either side of the wall clock time are
+        candidates. Ambiguous times prefer standard time, or the later UTC
+        time if that doesn't settle it. Non-existent times take the offset
+        from six hours earlier.
+
+        Args:
+            local: Seconds since the epoch, on the wall clock.
+        Returns the offset in seconds, so the UTC epoch is `local - offset`.
+        """
+        transitions = self.transitions
+        offsets = self.offsets
+        before = max(bisect_right(transitions, local - DAY) - 1, 0)
+        after = max(bisect_right(transitions, local + DAY) - 1, 0)
+        if before == after:
+            return offsets[before]
+        before_valid = self._valid(before, local)
+        after_valid = self._valid(after, local)
+        if before_valid and after_valid:
+            dst = self.dst
+            if dst[before] != dst[after]:
+                return offsets[after] if dst[before] else offsets[before]
+            return min(offsets[before], offsets[after])
+        elif before_valid:
+            return offsets[before]
+        elif after_valid:
+            return offsets[after]
+        return self.local_offset(local - _GAP)
+
+    def _valid(self, index, local):
+        """Check if a wall clock time really is in the period at `index`."""
+        utc = local - self.offsets[index]
+        if utc < self.transitions[index]:
+            return False
+        return index + 1 == len(self.transitions) or \
+            utc < self.transitions[index + 1]
+
+
+class OffsetCache(object):
+    """A `TransitionIndex` that remembers its last answer.
+
+    Each lookup remembers the offset it found, and the window of times it
+    holds for. Time-ordered input stays inside that window until the next
+    transition, so most lookups are a couple of comparisons rather than a
+    binary search. Anything outside the window, eg out of order, gets a
+    full lookup.
+
+    It has the same `utc_offset` and `local_offset` as the index, with the
+    same answers, so it can be used in its place. Unlike the index, which is
+    shared, make one for each stream of timestamps.
+
+    >>> offsets = OffsetCache(index_for(pytz.timezone("US/Pacific")))
+    >>> offsets.utc_offset(1355164289)[0] // 3600
+    -8
+    >>> offsets.utc_window[:2]
+    (1352019600, 1362909600)
+    """
+    __slots__ = ("index", "utc_window", "local_window")
+
+    def __init__(self, index):
+        self.index = index
+        # (start, end, offset, tzinfo) and (start, end, offset), replaced as
+        # a whole so threads can't see half of one.
+        self.utc_window = (0, 0, None, None)
+        self.local_window = (0, 0, None)
+
+    def utc_offset(self, utc):
+        """Like `TransitionIndex.utc_offset`."""
+        start, end, offset, tzinfo = self.utc_window
+        if start <= utc < end:
+            return (offset, tzinfo)
+        index = self.index
+        transitions = index.transitions
+        i = max(bisect_right(transitions, utc) - 1, 0)
+        offset = index.offsets[i]
+        tzinfo = index.tzinfos[i]
+        self.utc_window = (
+            transitions[i] if i else _FOREVER_AGO,
+            transitions[i + 1] if i + 1 < len(transitions) else _FOREVER,
+            offset, tzinfo)
+        return (offset, tzinfo)
+
+    def local_offset(self, local):
+        """Like `TransitionIndex.local_offset`.
+
+        Only wall clock times more than a day from any transition are
+        remembered, since that's when the index doesn't have to choose
+        between offsets.
+        """
+        start, end, offset = self.local_window
+        if start <= local < end:
+            return offset
+        index = self.index
+        transitions = index.transitions
+        before = max(bisect_right(transitions, local - DAY) - 1, 0)
+        after = max(bisect_right(transitions, local + DAY) - 1, 0)
+        if before != after:
+            return index.local_offset(local)
+        offset = index.offsets[before]
+        self.local_window = (
+            transitions[before] + DAY if before else _FOREVER_AGO,
+            transitions[before + 1] - DAY if before + 1 < len(transitions)
+            else _FOREVER,
+            offset)
+        return offset
+
+
+def index_for(timezone):
+    """Get the `TransitionIndex` for a timezone, building it if needed.
+
+    Returns None for tzinfos that aren't from pytz, since we can't see their
+    transitions.
+    """
+    try:
+        return _indexes[timezone]
+    except KeyError:
+        pass
+    except TypeError:
+        # Some tzinfos, like dateutil's, aren't hashable. They aren't from
+        # pytz either.
+        return None
+    if hasattr(timezone, "_utc_transition_times") or \
+            isinstance(timezone, _STATIC):
+        index = TransitionIndex(timezone)
+    else:
+        index = None
+    _indexes[timezone] = index
+    return index
+
+
+def local_seconds(timestamp):
+    """The whole seconds since the epoch of a datetime's wall clock time."""
+    return ((timestamp.toordinal() - EPOCH_ORDINAL) * DAY +
+            timestamp.hour * 3600 + timestamp.minute * 60 + timestamp.second)
+
+
+def _seconds(delta):
+    return delta.days * DAY + delta.seconds
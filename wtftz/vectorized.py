@@ -0,0 +1,126 @@
+"""Convert whole NumPy arrays of epochs at once.
+
+NumPy is an optional dependency, install it with `pip install wtftz[numpy]`.
+"""
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .converter import _resolve_tz
+from .transitions import DAY as _DAY
+from .transitions import index_for
+
+
+UNITS = {"s": 1, "ms": 10 ** 3, "us": 10 ** 6, "ns": 10 ** 9}
+
+# The transition tables, by timezone, as NumPy arrays.
+_tables = {}
+
+
+def convert_epochs(epochs, to_tz="utc", from_tz="utc", unit="s",
+                   output="datetime64"):
+    """Convert an array of epochs from one timezone to another.
+
+    Epochs are read as wall clock times in `from_tz`, which is UTC by
+    default, so plain Unix timestamps work as expected. Ambiguous and
+    non-existent wall clock times are resolved the same way `convert`
+    resolves a naive datetime.
+
+    Unlike `convert`, which reads an epoch with `datetime.fromtimestamp`, in
+    the machine's local time, epochs here never depend on the machine's
+    timezone. They only match `convert` when that is UTC.
+
+    Args:
+        epochs: An array-like of int or float epochs.
+        to_tz: The timezone you want to end up in.
+        from_tz: The timezone of the original epochs.
+        unit: The unit of the epochs: "s", "ms", "us" or "ns". Float epochs
+              are rounded to the microsecond, and come back in "us".
+        output: "datetime64" for an array of naive datetime64 wall clock
+                times, or "epoch" for an int64 array of wall clock epochs.
+    Returns a NumPy array of converted times.
+
+    >>> convert_epochs([1355164289], "est")
+    array(['2012-12-10T13:31:29'], dtype='datetime64[s]')
+    """
+    if numpy is None:
+        raise ImportError("wtftz.vectorized needs NumPy, "
+                          "pip install wtftz[numpy]")
+    if unit not in UNITS:
+        raise ValueError("Unknown unit {unit}".format(unit=unit))
+    if output not in ("datetime64", "epoch"):
+        raise ValueError("Unknown output {output}".format(output=output))
+    values = numpy.asarray(epochs)
+    if values.dtype.kind == "f":
+        values = numpy.round(values * (UNITS["us"] / float(UNITS[unit])))
+        unit = "us"
+    values = values.astype(numpy.int64)
+    scale = UNITS[unit]
+
+    utc = values - _local_to_utc_offsets(
+        values // scale, _table(_resolve_tz(from_tz))) * scale
+    local = utc + _utc_offsets(utc // scale, _table(_resolve_tz(to_tz))) * \
+        scale
+    if output == "epoch":
+        return local
+    return local.astype("datetime64[{unit}]".format(unit=unit))
+
+
+def _utc_offsets(seconds, table):
+    """Find the UTC offset, in seconds, at each UTC epoch."""
+    transitions, offsets, dst = table
+    index = numpy.searchsorted(transitions, seconds, side="right") - 1
+    return offsets[numpy.maximum(index, 0)]
+
+
+def _local_to_utc_offsets(seconds, table):
+    """Find the UTC offset, in seconds, of each wall clock epoch.
+
+    Like pytz's `localize` with `is_dst=False`, the offsets on either side of
+    the wall clock time, a day apart, are the only candidates. Ambiguous
+    times prefer standard time, and non-existent times use the offset from
+    before the transition.
+    """
+    transitions, offsets, dst = table
+    last = len(transitions) - 1
+    before = numpy.maximum(numpy.searchsorted(
+        transitions, seconds - _DAY, side="right") - 1, 0)
+    after = numpy.maximum(numpy.searchsorted(
+        transitions, seconds + _DAY, side="right") - 1, 0)
+
+    def valid(index):
+        utc = seconds - offsets[index]
+        upper = transitions[numpy.minimum(index + 1, last)]
+        return (transitions[index] <= utc) & ((index == last) | (utc < upper))
+
+    before_valid = valid(before)
+    after_valid = valid(after) & (after != before)
+    # Ambiguous times, where both are valid, take the standard time offset,
+    # or the later UTC time if neither or both are standard.
+    prefer_after = after_valid & (
+        ~before_valid |
+        (dst[before] & ~dst[after]) |
+        ((dst[before] == dst[after]) &
+         (offsets[after] < offsets[before])))
+    return numpy.where(prefer_after, offsets[after], offsets[before])
+
+
+def _table(timezone):
+    """Build, or look up, the transition table for a timezone.
+
+    Returns the arrays of the timezone's `TransitionIndex` as a tuple of
+    NumPy arrays (transitions, offsets, dst).
+    """
+    table = _tables.get(timezone)
+    if table is not None:
+        return table
+    index = index_for(timezone)
+    if index is None:
+        raise ValueError("Cannot vectorize timezone {tz}".format(
+            tz=timezone))
+    table = (numpy.frombuffer(index.transitions, dtype=numpy.int64),
+             numpy.array(index.offsets, dtype=numpy.int64),
+             numpy.array(index.dst, dtype=bool))
+    _tables[timezone] = table
+    return table